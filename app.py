@@ -1,20 +1,25 @@
 import asyncio
 import random
+import shutil
 import time
+import uuid
 from datetime import datetime
-import pytesseract
-from pdf2image import convert_from_bytes
-from PyPDF2 import PdfReader
-from deep_translator import GoogleTranslator
 
 import streamlit as st
 from dotenv import load_dotenv
 
-from ragbase.chain import ask_question, create_chain
+from ragbase.chain import ask_question
+from ragbase.cache import TTLCache
+from ragbase.chain_cache import QAChainCache, create_qa_chain, document_set_key
 from ragbase.config import Config
-from ragbase.ingestor import Ingestor
-from ragbase.model import create_llm
-from ragbase.retriever import create_retriever
+from ragbase.loader import load_pdf_text
+from ragbase.manifest import stream_digest
+from ragbase.model import warmup
+from ragbase.precompute import AnswerPrecomputer
+from ragbase.progress import summarize
+from ragbase.session_history import get_session_history
+from ragbase.streaming import BufferedRenderer
+from ragbase.translator import get_translator
 from ragbase.uploader import upload_files
 
 load_dotenv()
@@ -22,7 +27,7 @@ load_dotenv()
 if 'selected_language' not in st.session_state:
     st.session_state.selected_language = 'English'
 
-LOADING_MESSAGES = [
+LOADING_MESSAGE_TEXTS = [
     "🔍 Analyzing your legal documents...",
     "⚖️ Cross-referencing legal clauses...",
     "📚 Diving into your case files...",
@@ -31,6 +36,9 @@ LOADING_MESSAGES = [
     "💼 Summarizing contractual obligations...",
 ]
 
+# Translated for the selected language by initialize_app
+LOADING_MESSAGES = LOADING_MESSAGE_TEXTS
+
 # New feature: Common legal questions
 COMMON_QUESTIONS = [
     "What are the main obligations in this contract?",
@@ -40,6 +48,16 @@ COMMON_QUESTIONS = [
     "What is the duration of this agreement?",
 ]
 
+QUICK_ACTION_LABELS = [
+    "📋 Main Obligations",
+    "🚫 Termination Terms",
+    "💰 Payment Terms",
+    "🔒 Confidentiality",
+    "⏱️ Duration",
+]
+
+CHAT_PLACEHOLDER = "Ask your question here"
+
 SUPPORTED_LANGUAGES = {
     'English': 'en',
     'Hindi': 'hi',
@@ -192,18 +210,10 @@ def custom_css():
 
 
 def extract_text_from_pdf(uploaded_files):
-    extracted_text = ""
-    for uploaded_file in uploaded_files:
-        pdf = PdfReader(uploaded_file)
-        for page in pdf.pages:
-            extracted_text += page.extract_text() or ""
-        
-        # OCR for image-based PDFs
-        images = convert_from_bytes(uploaded_file.getvalue())
-        for image in images:
-            extracted_text += pytesseract.image_to_string(image)
-            
-    return extracted_text
+    # OCR runs only for pages without a text layer
+    return "".join(
+        load_pdf_text(uploaded_file.getvalue()) for uploaded_file in uploaded_files
+    )
 
 # Identify legal keywords
 IMPORTANT_TERMS = [
@@ -231,17 +241,85 @@ def get_document_stats(files):
 
 
 @st.cache_resource(show_spinner=False)
-def build_qa_chain(files):
-    file_paths = upload_files(files)
-    vector_store = Ingestor().ingest(file_paths)
-    llm = create_llm()
-    retriever = create_retriever(llm, vector_store=vector_store)
-    return create_chain(llm, retriever)
+def warmup_models():
+    return warmup()
+
+
+@st.cache_resource(show_spinner=False)
+def get_chain_cache():
+    return QAChainCache()
+
+
+@st.cache_resource(show_spinner=False)
+def get_quick_answers():
+    return TTLCache(
+        max_entries=Config.Cache.CHAINS_MAX_ENTRIES, ttl=Config.Retriever.CACHE_TTL
+    )
+
+
+def upload_digest(file):
+    file.seek(0)
+    digest = stream_digest(file)
+    file.seek(0)
+    return digest
+
+
+def build_qa_chain(files, on_progress=None):
+    source_hashes = sorted({upload_digest(file) for file in files})
+
+    def build():
+        upload_dir = Config.Path.DOCUMENTS_DIR / document_set_key(source_hashes)
+        file_paths = upload_files(files, directory=upload_dir)
+        try:
+            chain = create_qa_chain(source_hashes, file_paths, on_progress)
+        finally:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+        if Config.QuickActions.PRECOMPUTE:
+            get_quick_answers().set(
+                document_set_key(source_hashes),
+                AnswerPrecomputer(chain, COMMON_QUESTIONS).start(),
+            )
+        return chain
+
+    st.session_state.document_set_key = document_set_key(source_hashes)
+    return get_chain_cache().get_or_build(source_hashes, build)
+
+
+def show_sources(documents):
+    # Show source documents with their reranker scores
+    for i, doc in enumerate(documents):
+        title = f"Source #{i+1}"
+        score = doc.metadata.get("relevance_score")
+        if score is not None:
+            title += f" - Relevance: {float(score):.0%}"
+        with st.expander(title):
+            st.write(doc.page_content)
+
+
+def show_precomputed_answer(precomputed):
+    with st.chat_message(
+        "assistant", avatar=str(Config.Path.IMAGES_DIR / "assistant-avatar.png")
+    ):
+        st.markdown(precomputed.answer)
+        show_sources(precomputed.documents)
+
+    history = get_session_history(st.session_state.session_id)
+    history.add_user_message(precomputed.question)
+    history.add_ai_message(precomputed.answer)
+    st.session_state.messages.append({
+        "role": "assistant",
+        "content": precomputed.answer,
+        "timestamp": datetime.now().strftime("%H:%M:%S")
+        })
+
+
+def get_precomputed_answer(question):
+    precomputer = get_quick_answers().get(st.session_state.get("document_set_key"))
+    return precomputer.get(question) if precomputer else None
 
 
 async def ask_chain(question: str, chain):
     start_time = time.time()
-    full_response = ""
     assistant = st.chat_message(
         "assistant", avatar=str(Config.Path.IMAGES_DIR / "assistant-avatar.png")
     )
@@ -249,16 +327,17 @@ async def ask_chain(question: str, chain):
         message_placeholder = st.empty()
         message_placeholder.status(random.choice(LOADING_MESSAGES), state="running")
         documents = []
-        async for event in ask_question(chain, question, session_id="session-id-42"):
-            if type(event) is str:
-                full_response += event
-                message_placeholder.markdown(full_response)
-            if type(event) is list:
-                documents.extend(event)
-        # Show source documents with relevance scores
-        for i, doc in enumerate(documents):
-            with st.expander(f"Source #{i+1} - Relevance: {random.randint(75, 99)}%"):
-                st.write(doc.page_content)
+        # Coalesce tokens so the growing answer is not re-rendered per token
+        with BufferedRenderer(message_placeholder.markdown) as renderer:
+            async for event in ask_question(
+                chain, question, session_id=st.session_state.session_id
+            ):
+                if type(event) is str:
+                    renderer.write(event)
+                if type(event) is list:
+                    documents.extend(event)
+        full_response = renderer.text
+        show_sources(documents)
 
         # Show response time
         response_time = time.time() - start_time
@@ -415,26 +494,38 @@ def show_upload_documents():
         st.stop()
 
     with st.spinner("🔄 Processing your documents..."):
-        progress_bar = st.progress(0)
-        for i in range(100):
-            progress_bar.progress(i + 1)
-            if i % 50 == 0:
-                st.markdown(random.choice(LOADING_MESSAGES))
-            asyncio.sleep(0.01)
+        progress_bar = st.progress(0, text=random.choice(LOADING_MESSAGES))
+        events = []
+
+        def on_progress(event):
+            events.append(event)
+            progress_bar.progress(
+                event.fraction,
+                text=f"{event.source} · {event.stage.replace('_', ' ')}: "
+                f"{event.items} items in {event.seconds:.2f}s",
+            )
+
+        chain = build_qa_chain(uploaded_files, on_progress)
+        progress_bar.empty()
+        if Config.DEBUG and events:
+            st.sidebar.json(summarize(events))
         holder.empty()
-        return build_qa_chain(uploaded_files)
+        return chain
 
 
 def show_message_history():
     target_lang = SUPPORTED_LANGUAGES[st.session_state.selected_language]
     
-    for message in st.session_state.messages:
+    # Translate all message contents in one batch
+    translated_contents = translate_texts(
+        [message["content"] for message in st.session_state.messages], target_lang
+    )
+
+    for message, translated_content in zip(
+        st.session_state.messages, translated_contents
+    ):
         role = message["role"]
-        content = message["content"]
-        
-        # Translate message content
-        translated_content = translate_text(content, target_lang)
-        
+
         avatar_path = (
             Config.Path.IMAGES_DIR / "assistant-avatar.png"
             if role == "assistant"
@@ -446,18 +537,9 @@ def show_message_history():
                 st.markdown(f"<div class='chat-info'>{message['timestamp']}</div>", unsafe_allow_html=True)
 
 def show_quick_actions():
-    target_lang = SUPPORTED_LANGUAGES[st.session_state.selected_language]
-    
     st.markdown("<div class='quick-actions'>", unsafe_allow_html=True)
     
-    # Translate button texts
-    quick_button_texts = [
-        translate_text("📋 Main Obligations", target_lang),
-        translate_text("🚫 Termination Terms", target_lang),
-        translate_text("💰 Payment Terms", target_lang),
-        translate_text("🔒 Confidentiality", target_lang),
-        translate_text("⏱️ Duration", target_lang)
-    ]
+    quick_button_texts = UI_STRINGS["quick_actions"]
     
     rows = [quick_button_texts[i:i+2] for i in range(0, len(quick_button_texts), 2)]
     
@@ -472,19 +554,22 @@ def show_quick_actions():
                     avatar=str(Config.Path.IMAGES_DIR / "user-avatar.png"),
                 ):
                     st.markdown(original_question)
-                asyncio.run(ask_chain(original_question, st.session_state.chain))
+                precomputed = get_precomputed_answer(original_question)
+                if precomputed:
+                    show_precomputed_answer(precomputed)
+                else:
+                    asyncio.run(ask_chain(original_question, st.session_state.chain))
     
     st.markdown("</div>", unsafe_allow_html=True)
 
 
 def show_chat_input(chain):
-    target_lang = SUPPORTED_LANGUAGES[st.session_state.selected_language]
     source_lang = SUPPORTED_LANGUAGES[st.session_state.selected_language]
     
     st.session_state.chain = chain
     show_quick_actions()
 
-    placeholder_text = translate_text("Ask your question here", target_lang)
+    placeholder_text = UI_STRINGS["chat_placeholder"]
     
     if prompt := st.chat_input(placeholder_text):
         # Translate user input to English for processing
@@ -504,34 +589,54 @@ def show_chat_input(chain):
         asyncio.run(ask_chain(english_prompt, chain))
 
 
+def translate_texts(texts, target_lang: str, source_lang: str = 'en'):
+    """Translate a batch of texts to target language."""
+    try:
+        return get_translator().translate_many(texts, target_lang, source_lang)
+    except Exception as e:
+        st.error(f"Translation error: {str(e)}")
+        return list(texts)
+
+
 def translate_text(text: str, target_lang: str, source_lang: str = 'en') -> str:
     """Translate text to target language."""
+    return translate_texts([text], target_lang, source_lang)[0]
+
+
+UI_TEXTS = LOADING_MESSAGE_TEXTS + QUICK_ACTION_LABELS + [CHAT_PLACEHOLDER]
+
+
+def split_ui_strings(texts):
+    quick_actions_end = len(LOADING_MESSAGE_TEXTS) + len(QUICK_ACTION_LABELS)
+    return {
+        "loading_messages": texts[: len(LOADING_MESSAGE_TEXTS)],
+        "quick_actions": texts[len(LOADING_MESSAGE_TEXTS) : quick_actions_end],
+        "chat_placeholder": texts[quick_actions_end],
+    }
+
+
+@st.cache_data(show_spinner=False)
+def translate_ui_strings(target_lang):
+    """Translate all static UI strings for a language in one batch."""
+    # Errors are raised, not cached, so a failed translation is retried
+    return split_ui_strings(get_translator().translate_many(UI_TEXTS, target_lang))
+
+
+def get_ui_strings(target_lang):
     try:
-        if target_lang == source_lang:
-            return text
-        translator = GoogleTranslator(source=source_lang, target=target_lang)
-        return translator.translate(text)
+        return translate_ui_strings(target_lang)
     except Exception as e:
         st.error(f"Translation error: {str(e)}")
-        return text
+        return split_ui_strings(UI_TEXTS)
 
 
-def get_loading_messages(target_lang):
-    messages = [
-        "🔍 Analyzing your legal documents...",
-        "⚖️ Cross-referencing legal clauses...",
-        "📚 Diving into your case files...",
-        "🧠 Decoding legal complexities...",
-        "📊 Extracting key legal insights...",
-        "💼 Summarizing contractual obligations...",
-    ]
-    return [translate_text(msg, target_lang) for msg in messages]
-
-# Update LOADING_MESSAGES usage in the code
-LOADING_MESSAGES = get_loading_messages(SUPPORTED_LANGUAGES[st.session_state.selected_language])
+UI_STRINGS = split_ui_strings(UI_TEXTS)
 
 
 def initialize_app():
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = str(uuid.uuid4())
+
     if 'messages' not in st.session_state:
         initial_message = "Hi! What do you want to know about your documents?"
         st.session_state.messages = [
@@ -542,14 +647,18 @@ def initialize_app():
             }
         ]
     
-    # Update loading messages based on selected language
-    global LOADING_MESSAGES
+    # Update UI strings based on selected language
+    global LOADING_MESSAGES, UI_STRINGS
     target_lang = SUPPORTED_LANGUAGES[st.session_state.selected_language]
-    LOADING_MESSAGES = get_loading_messages(target_lang)
+    UI_STRINGS = get_ui_strings(target_lang)
+    LOADING_MESSAGES = UI_STRINGS["loading_messages"]
 
 
 initialize_app()
 
+if Config.Model.WARMUP:
+    warmup_models()
+
 if Config.CONVERSATION_MESSAGES_LIMIT > 0 and Config.CONVERSATION_MESSAGES_LIMIT <= len(
     st.session_state.messages
 ):
@@ -0,0 +1,83 @@
+import random
+from pathlib import Path
+from typing import List
+
+from benchmarks.embeddings import WORDS
+
+LINES_PER_PAGE = 45
+WORDS_PER_LINE = 12
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: Path, pages: List[List[str]]):
+    """Writes a minimal PDF with one Helvetica text block per page."""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for lines in pages:
+        operations = ["BT /F1 10 Tf 56 760 Td 16 TL"]
+        operations += [f"({_escape(line)}) Tj T*" for line in lines]
+        operations.append("ET")
+        stream = "\n".join(operations)
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Contents {len(objects)} 0 R "
+            "/Resources << /Font << /F1 3 0 R >> >> >>"
+        )
+        kids.append(len(objects))
+    references = " ".join(f"{kid} 0 R" for kid in kids)
+    objects[1] = f"<< /Type /Pages /Kids [{references}] /Count {len(kids)} >>"
+
+    content = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(content))
+        content += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref_offset = len(content)
+    content += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    content += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode(
+        "latin-1"
+    )
+    content += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref_offset}\n%%EOF\n"
+    ).encode("latin-1")
+    Path(path).write_bytes(content)
+
+
+def fact(document: int, page: int) -> str:
+    return f"Clause {document}-{page}: the fee for schedule {document}-{page} is due."
+
+
+def question(document: int, page: int) -> str:
+    return f"When is the fee for schedule {document}-{page} due?"
+
+
+def generate_corpus(
+    directory: Path, documents: int, pages: int, seed: int = 42
+) -> List[Path]:
+    """Writes synthetic contracts, each page starting with a unique fact."""
+    rng = random.Random(seed)
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for document in range(documents):
+        content = []
+        for page in range(pages):
+            lines = [fact(document, page)]
+            lines += [
+                " ".join(rng.choices(WORDS, k=WORDS_PER_LINE)).capitalize() + "."
+                for _ in range(LINES_PER_PAGE - 1)
+            ]
+            content.append(lines)
+        path = directory / f"contract-{document:04d}.pdf"
+        write_pdf(path, content)
+        paths.append(path)
+    return paths
@@ -0,0 +1,66 @@
+import argparse
+import json
+import random
+import time
+from typing import List
+
+from ragbase.config import Config
+from ragbase.embeddings import FastEmbedEngine
+
+WORDS = (
+    "agreement party shall indemnify liability termination notice payment "
+    "confidential obligation breach clause term lessor lessee warranty "
+    "governing law dispute arbitration assignment schedule effective date"
+).split()
+
+
+def synthetic_chunks(count: int, words: int, seed: int = 42) -> List[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=words)) for _ in range(count)]
+
+
+def run(engine: FastEmbedEngine, chunks: List[str]) -> float:
+    engine.embed_documents(chunks[: engine.batch_size * engine.workers + 1])
+    start_time = time.perf_counter()
+    engine.embed_documents(chunks)
+    return len(chunks) / (time.perf_counter() - start_time)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding throughput benchmark")
+    parser.add_argument("--model", default=Config.Model.EMBEDDINGS)
+    parser.add_argument("--chunks", type=int, default=2048)
+    parser.add_argument("--words", type=int, default=300)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, nargs="+", default=[0])
+    args = parser.parse_args()
+
+    chunks = synthetic_chunks(args.chunks, args.words)
+    for threads in args.threads:
+        for workers in args.workers:
+            for batch_size in args.batch_sizes:
+                engine = FastEmbedEngine(
+                    model_name=args.model,
+                    batch_size=batch_size,
+                    workers=workers,
+                    threads=threads or None,
+                )
+                try:
+                    chunks_per_second = run(engine, chunks)
+                finally:
+                    engine.close()
+                result = {
+                    "benchmark": "embeddings",
+                    "model": args.model,
+                    "batch_size": batch_size,
+                    "workers": workers,
+                    "threads": threads or None,
+                    "chunks": len(chunks),
+                    "chunks_per_second": round(chunks_per_second, 2),
+                }
+                print(json.dumps(result), flush=True)
+
+
+if __name__ == "__main__":
+    main()
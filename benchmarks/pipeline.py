@@ -0,0 +1,213 @@
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from langchain_core.documents import Document
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from benchmarks.corpus import generate_corpus, question
+from ragbase.chain import ask_question, create_chain
+from ragbase.config import Config
+from ragbase.database import create_vector_store
+from ragbase.ingestor import Ingestor
+from ragbase.manifest import file_digest
+from ragbase.model import create_embeddings, create_reranker
+from ragbase.progress import IngestionEvent, summarize
+from ragbase.retriever import RerankRetriever, create_retriever
+
+ANSWER = "The fee is due within thirty days of the invoice date."
+
+
+def use_home(home: Path):
+    # Keeps the benchmark database and caches out of the application ones
+    Config.Path.DATABASE_DIR = home / "docs-db"
+    Config.Path.MANIFEST_FILE = Config.Path.DATABASE_DIR / "manifest.json"
+    Config.Path.DOCUMENT_SETS_DIR = home / "document-sets"
+    Config.Path.DOCUMENTS_DIR = home / "tmp"
+    Config.Path.CACHE_DIR = home / "cache"
+    Config.Path.SESSIONS_FILE = home / "sessions.sqlite"
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    values = sorted(values)
+
+    def percentile(q: float) -> float:
+        position = q * (len(values) - 1)
+        lower = int(position)
+        upper = min(lower + 1, len(values) - 1)
+        value = values[lower] + (values[upper] - values[lower]) * (position - lower)
+        return round(value * 1000, 2)
+
+    return {
+        "count": len(values),
+        "p50_ms": percentile(0.5),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "mean_ms": round(sum(values) / len(values) * 1000, 2),
+    }
+
+
+def settings() -> dict:
+    return {
+        "embeddings": Config.Model.EMBEDDINGS,
+        "reranker": Config.Model.RERANKER if Config.Retriever.USE_RERANKER else None,
+        "search_k": Config.Retriever.SEARCH_K,
+        "rerank_pool_size": Config.Retriever.RERANK_POOL_SIZE,
+        "rerank_step": Config.Retriever.RERANK_STEP,
+        "rerank_top_n": Config.Retriever.RERANK_TOP_N,
+        "ingestion_workers": Config.Ingestion.WORKERS,
+        "ingestion_batch_size": Config.Ingestion.BATCH_SIZE,
+        "context_max_tokens": Config.Chain.CONTEXT_MAX_TOKENS,
+    }
+
+
+def benchmark_ingest(doc_paths: List[Path]) -> dict:
+    events: List[IngestionEvent] = []
+    start_time = time.perf_counter()
+    Ingestor().ingest(doc_paths, on_progress=events.append)
+    seconds = time.perf_counter() - start_time
+
+    stages = summarize(events)
+    pages = stages.get("load", (0, 0.0))[0]
+    chunks = stages.get("upsert", (0, 0.0))[0]
+    return {
+        "benchmark": "ingest",
+        "documents": len(doc_paths),
+        "pages": pages,
+        "chunks": chunks,
+        "seconds": round(seconds, 3),
+        "pages_per_second": round(pages / seconds, 2),
+        "chunks_per_second": round(chunks / seconds, 2),
+        "stages": {
+            stage: {"items": items, "seconds": round(stage_seconds, 3)}
+            for stage, (items, stage_seconds) in stages.items()
+        },
+    }
+
+
+def benchmark_retrieval(retriever, questions: List[str]) -> dict:
+    latencies = []
+    for query in questions:
+        start_time = time.perf_counter()
+        retriever.invoke(query)
+        latencies.append(time.perf_counter() - start_time)
+    return {"benchmark": "retrieval", **percentiles(latencies)}
+
+
+class CountingRerankRetriever(RerankRetriever):
+    # The plateau can stop reranking before the whole pool is scored
+    scored: int = 0
+
+    def _score(self, query: str, documents: List[Document]) -> List[float]:
+        self.scored += len(documents)
+        return super()._score(query, documents)
+
+
+def benchmark_rerank(vector_store, questions: List[str], k: int) -> dict:
+    retriever = CountingRerankRetriever(
+        retriever=vector_store.as_retriever(), reranker=create_reranker()
+    )
+    latencies, candidates = [], []
+    for query in questions:
+        documents = vector_store.similarity_search(query, k=k)
+        retriever.scored = 0
+        start_time = time.perf_counter()
+        retriever._rerank(query, documents)
+        latencies.append(time.perf_counter() - start_time)
+        candidates.append(retriever.scored)
+    return {
+        "benchmark": "rerank",
+        "pool_size": k,
+        "candidates_mean": round(sum(candidates) / len(candidates), 2),
+        "candidates_max": max(candidates),
+        **percentiles(latencies),
+    }
+
+
+async def benchmark_answers(chain, questions: List[str]) -> dict:
+    first_token, total = [], []
+    for number, query in enumerate(questions):
+        start_time = time.perf_counter()
+        async for event in ask_question(chain, query, f"benchmark-{number}"):
+            if type(event) is str and len(first_token) == len(total):
+                first_token.append(time.perf_counter() - start_time)
+        total.append(time.perf_counter() - start_time)
+    return {
+        "benchmark": "answer",
+        "time_to_first_token": percentiles(first_token),
+        "end_to_end": percentiles(total),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Offline ingestion, retrieval and answer latency benchmark"
+    )
+    parser.add_argument("--documents", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument(
+        "--corpus", type=Path, help="Reuse or generate the corpus in this folder"
+    )
+    parser.add_argument(
+        "--home", type=Path, help="Database and cache folder, empty for cold runs"
+    )
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--no-rerank", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="Also write results to a file")
+    args = parser.parse_args()
+
+    home = args.home or Path(tempfile.mkdtemp(prefix="ragbase-benchmark-"))
+    use_home(home)
+    # Every question should reach the retriever and the model
+    Config.Retriever.USE_CACHE = False
+    Config.Model.CACHE_RESPONSES = False
+    Config.History.SUMMARIZE = False
+    if args.no_rerank:
+        Config.Retriever.USE_RERANKER = False
+
+    corpus = args.corpus or home / "corpus"
+    doc_paths = sorted(corpus.glob("*.pdf")) or generate_corpus(
+        corpus, args.documents, args.pages, seed=args.seed
+    )
+    questions = [
+        question(document, page)
+        for document in range(args.documents)
+        for page in range(args.pages)
+    ]
+    rng = random.Random(args.seed)
+    questions = rng.sample(questions, k=min(args.questions, len(questions)))
+
+    results = [{"benchmark": "settings", **settings()}]
+    results.append(benchmark_ingest(doc_paths))
+
+    # Queries go straight to the embedding engine, without the SQLite and
+    # in-process embedding caches, so every phase pays for embedding them
+    vector_store = create_vector_store(create_embeddings().embeddings)
+    llm = FakeListChatModel(responses=[ANSWER], sleep=args.token_delay or None)
+    source_hashes = [file_digest(path) for path in doc_paths]
+    retriever = create_retriever(llm, vector_store, source_hashes)
+    results.append(benchmark_retrieval(retriever, questions))
+    if Config.Retriever.USE_RERANKER:
+        results.append(
+            benchmark_rerank(
+                vector_store, questions, k=Config.Retriever.RERANK_POOL_SIZE
+            )
+        )
+    chain = create_chain(llm, retriever)
+    results.append(asyncio.run(benchmark_answers(chain, questions)))
+
+    lines = [json.dumps(result) for result in results]
+    print("\n".join(lines))
+    if args.output:
+        args.output.write_text("\n".join(lines) + "\n")
+
+
+if __name__ == "__main__":
+    main()
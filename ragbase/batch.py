@@ -0,0 +1,158 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional, TextIO
+
+from langchain_core.runnables import Runnable
+
+from ragbase.chain import ask_question
+from ragbase.chain_cache import create_qa_chain
+from ragbase.config import Config
+from ragbase.manifest import file_digest
+from ragbase.progress import IngestionEvent
+from ragbase.session_history import store
+
+
+class RateLimiter:
+    def __init__(self, rate: Optional[float]):
+        self.interval = 1 / rate if rate else 0.0
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            delay = self._next_start - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_start = time.monotonic() + self.interval
+
+
+def read_questions(path: Path) -> List[dict]:
+    questions = []
+    with Path(path).open(encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line) if line.startswith(("{", '"')) else line
+            if isinstance(item, str):
+                item = {"question": item}
+            item.setdefault("id", len(questions))
+            questions.append(item)
+    return questions
+
+
+async def answer_question(
+    chain: Runnable,
+    item: dict,
+    semaphore: asyncio.Semaphore,
+    rate_limiter: RateLimiter,
+) -> dict:
+    async with semaphore:
+        await rate_limiter.wait()
+        # Every question is answered without chat history
+        session_id = f"batch-{uuid.uuid4()}"
+        answer, sources = [], []
+        timings = {}
+        error = None
+        start_time = time.perf_counter()
+        try:
+            async for event in ask_question(chain, item["question"], session_id):
+                elapsed = time.perf_counter() - start_time
+                if type(event) is str:
+                    timings.setdefault("first_token_seconds", elapsed)
+                    answer.append(event)
+                if type(event) is list:
+                    timings.setdefault("retrieval_seconds", elapsed)
+                    sources.extend(event)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            store.delete(session_id)
+        timings["total_seconds"] = time.perf_counter() - start_time
+
+    result = {
+        **item,
+        "answer": "".join(answer),
+        "sources": [
+            {
+                "source": doc.metadata.get("source"),
+                "start_index": doc.metadata.get("start_index"),
+                "content": doc.page_content,
+            }
+            for doc in sources
+        ],
+        "timings": {name: round(value, 4) for name, value in timings.items()},
+    }
+    if error:
+        result["error"] = error
+    return result
+
+
+async def run(
+    chain: Runnable,
+    questions: List[dict],
+    output: TextIO,
+    concurrency: int,
+    rate: Optional[float],
+) -> int:
+    semaphore = asyncio.Semaphore(concurrency)
+    rate_limiter = RateLimiter(rate)
+    tasks = [
+        answer_question(chain, item, semaphore, rate_limiter) for item in questions
+    ]
+    errors = 0
+    # Results are written as they complete, so partial runs keep their answers
+    for task in asyncio.as_completed(tasks):
+        result = await task
+        errors += "error" in result
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        output.flush()
+    return errors
+
+
+def log_progress(event: IngestionEvent):
+    print(
+        f"[{event.completed}/{event.total}] {event.source}: {event.stage} "
+        f"{event.items} in {event.seconds:.2f}s",
+        file=sys.stderr,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Answer a file of questions over a folder of PDF documents"
+    )
+    parser.add_argument("documents", type=Path, help="Folder with PDF documents")
+    parser.add_argument("questions", type=Path, help="JSONL or text, one per line")
+    parser.add_argument("-o", "--output", default="-", help="JSONL answers file")
+    parser.add_argument("--concurrency", type=int, default=Config.Model.LLM_CONCURRENCY)
+    parser.add_argument("--rate", type=float, help="Maximum questions per second")
+    args = parser.parse_args()
+
+    doc_paths = sorted(args.documents.glob("*.pdf"))
+    if not doc_paths:
+        parser.error(f"No PDF documents found in {args.documents}")
+    questions = read_questions(args.questions)
+
+    source_hashes = sorted({file_digest(doc_path) for doc_path in doc_paths})
+    chain = create_qa_chain(source_hashes, doc_paths, on_progress=log_progress)
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        errors = asyncio.run(run(chain, questions, output, args.concurrency, args.rate))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(f"Answered {len(questions) - errors}/{len(questions)}", file=sys.stderr)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import re
+from functools import partial
 from operator import itemgetter
 from typing import List
 
@@ -12,6 +13,9 @@ from langchain_core.tracers.stdout import ConsoleCallbackHandler
 from langchain_core.vectorstores import VectorStoreRetriever
 
 from ragbase.config import Config
+from ragbase.context import pack_documents
+from ragbase.llm_cache import CachedChatModel, get_llm_cache
+from ragbase.metrics import StageTimingHandler, metrics
 from ragbase.session_history import get_session_history
 
 SYSTEM_PROMPT = """
@@ -35,7 +39,7 @@ def remove_links(text: str) -> str:
 
 def format_documents(documents: List[Document]) -> str:
     texts = []
-    for doc in documents:
+    for doc in pack_documents(documents):
         texts.append(doc.page_content)
         texts.append("---")
 
@@ -43,6 +47,11 @@ def format_documents(documents: List[Document]) -> str:
 
 
 def create_chain(llm: BaseLanguageModel, retriever: VectorStoreRetriever) -> Runnable:
+    summarizer = llm if Config.History.SUMMARIZE else None
+    # With temperature 0 answers are deterministic for a given rendered prompt
+    if Config.Model.CACHE_RESPONSES and Config.Model.TEMPERATURE == 0:
+        llm = CachedChatModel(llm=llm, response_cache=get_llm_cache())
+
     prompt = ChatPromptTemplate.from_messages(
         [
             ("system", SYSTEM_PROMPT),
@@ -63,17 +72,20 @@ def create_chain(llm: BaseLanguageModel, retriever: VectorStoreRetriever) -> Run
 
     return RunnableWithMessageHistory(
         chain,
-        get_session_history,
+        partial(get_session_history, summarizer=summarizer),
         input_messages_key="question",
         history_messages_key="chat_history",
     ).with_config({"run_name": "chain_answer"})
 
 
 async def ask_question(chain: Runnable, question: str, session_id: str):
+    callbacks = [ConsoleCallbackHandler()] if Config.DEBUG else []
+    if Config.Metrics.ENABLED:
+        callbacks.append(StageTimingHandler())
     async for event in chain.astream_events(
         {"question": question},
         config={
-            "callbacks": [ConsoleCallbackHandler()] if Config.DEBUG else [],
+            "callbacks": callbacks,
             "configurable": {"session_id": session_id},
         },
         version="v2",
@@ -84,3 +96,8 @@ async def ask_question(chain: Runnable, question: str, session_id: str):
             yield event["data"]["output"]
         if event_type == "on_chain_stream":
             yield event["data"]["chunk"].content
+
+    if Config.Metrics.ENABLED:
+        metrics.inc("ragbase_questions")
+        if Config.Metrics.FILE:
+            metrics.write(Config.Metrics.FILE)
@@ -0,0 +1,161 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from langchain_core.runnables import Runnable
+
+from ragbase.chain import create_chain
+from ragbase.config import Config
+from ragbase.database import create_vector_store, delete_database, manifest_file
+from ragbase.ingestor import Ingestor
+from ragbase.manifest import IngestionManifest
+from ragbase.model import create_embeddings, create_llm
+from ragbase.progress import ProgressCallback
+from ragbase.retriever import create_retriever
+
+
+def document_set_key(source_hashes: List[str]) -> str:
+    return hashlib.sha256("\n".join(sorted(source_hashes)).encode("utf-8")).hexdigest()
+
+
+def document_set_dir(key: str) -> Path:
+    return Config.Path.DOCUMENT_SETS_DIR / key
+
+
+def create_qa_chain(
+    source_hashes: List[str],
+    doc_paths: Optional[List[Path]] = None,
+    on_progress: Optional[ProgressCallback] = None,
+) -> Runnable:
+    # Every document set has its own database, so dropping a set frees it
+    database_dir = document_set_dir(document_set_key(source_hashes))
+    if doc_paths:
+        vector_store = Ingestor().ingest(
+            doc_paths,
+            prune=False,
+            on_progress=on_progress,
+            database_dir=database_dir,
+        )
+    else:
+        vector_store = create_vector_store(create_embeddings(), database_dir)
+    llm = create_llm()
+    retriever = create_retriever(
+        llm,
+        vector_store=vector_store,
+        source_hashes=source_hashes,
+        database_dir=database_dir,
+    )
+    return create_chain(llm, retriever)
+
+
+class QAChainCache:
+    """LRU cache of QA chains, one per document set.
+
+    The budget covers the databases of the sets: evicting a set deletes its
+    database, so its vectors are no longer held in memory. Sets persisted by
+    earlier runs are reused while they fit in the budget.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = Config.Cache.CHAINS_MAX_ENTRIES,
+        max_bytes: int = Config.Cache.CHAINS_MAX_BYTES,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, Tuple[Optional[Runnable], int]] = OrderedDict()
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._load_persisted()
+
+    def _load_persisted(self):
+        # Persisted sets have no chain until they are asked for again; the
+        # least recently ingested ones are evicted first
+        sets_dir = Config.Path.DOCUMENT_SETS_DIR
+        if not sets_dir.exists():
+            return
+        manifests = sorted(
+            (
+                manifest_file(set_dir)
+                for set_dir in sets_dir.iterdir()
+                if set_dir.is_dir()
+            ),
+            key=lambda path: path.stat().st_mtime if path.exists() else 0,
+        )
+        for path in manifests:
+            manifest = IngestionManifest(path)
+            self._entries[path.parent.name] = (
+                None,
+                manifest.size_bytes(list(manifest.documents)),
+            )
+        for key in self._evict():
+            self._release(key)
+
+    def _cached(self, key: str) -> Optional[Runnable]:
+        chain, _ = self._entries.get(key, (None, 0))
+        if chain is not None:
+            self._entries.move_to_end(key)
+        return chain
+
+    def get(self, source_hashes: List[str]) -> Optional[Runnable]:
+        with self._lock:
+            return self._cached(document_set_key(source_hashes))
+
+    def get_or_build(
+        self, source_hashes: List[str], build: Callable[[], Runnable]
+    ) -> Runnable:
+        key = document_set_key(source_hashes)
+        with self._lock:
+            chain = self._cached(key)
+            if chain is not None:
+                return chain
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                chain = self._cached(key)
+                if chain is not None:
+                    return chain
+            chain = build()
+            size_bytes = IngestionManifest(
+                manifest_file(document_set_dir(key))
+            ).size_bytes(source_hashes)
+            with self._lock:
+                self._entries[key] = (chain, size_bytes)
+                self._entries.move_to_end(key)
+                self._build_locks.pop(key, None)
+                evicted = self._evict()
+
+        for evicted_key in evicted:
+            self._release(evicted_key)
+        return chain
+
+    def _evict(self) -> List[str]:
+        evicted = []
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes
+        ):
+            evicted.append(self._entries.popitem(last=False)[0])
+        return evicted
+
+    def _release(self, key: str):
+        # Waits for a build of the same set, which keeps the database. Chains
+        # still answering a question over an evicted set fail.
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        with build_lock:
+            with self._lock:
+                if self._build_locks.get(key) is build_lock:
+                    del self._build_locks[key]
+                if key in self._entries:
+                    return
+            delete_database(document_set_dir(key))
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(size_bytes for _, size_bytes in self._entries.values())
+
+    def __len__(self) -> int:
+        return sum(chain is not None for chain, _ in self._entries.values())
@@ -6,24 +6,115 @@ class Config:
     class Path:
         APP_HOME = Path(os.getenv("APP_HOME", Path(__file__).parent.parent))
         DATABASE_DIR = APP_HOME / "docs-db"
+        MANIFEST_FILE = DATABASE_DIR / "manifest.json"
+        DOCUMENT_SETS_DIR = APP_HOME / "document-sets"
         DOCUMENTS_DIR = APP_HOME / "tmp"
         IMAGES_DIR = APP_HOME / "images"
+        CACHE_DIR = APP_HOME / "cache"
+        SESSIONS_FILE = APP_HOME / "sessions.sqlite"
 
     class Database:
         DOCUMENTS_COLLECTION = "documents"
 
     class Model:
         EMBEDDINGS = "BAAI/bge-base-en-v1.5"
+        EMBEDDING_BATCH_SIZE = 64
+        EMBEDDING_WORKERS = 1
+        EMBEDDING_THREADS = None
         RERANKER = "ms-marco-MiniLM-L-12-v2"
         LOCAL_LLM = "gemma2:9b"
         REMOTE_LLM = "llama-3.3-70b-versatile"
         TEMPERATURE = 0.0
         MAX_TOKENS = 8000
         USE_LOCAL = False
+        WARMUP = True
+        LLM_CONCURRENCY = 4
+        CACHE_RESPONSES = True
+
+    class Gateway:
+        ENABLED = True
+        INITIAL_CONCURRENCY = 4
+        MAX_CONCURRENCY = 32
+        MAX_RETRIES = 3
+        BACKOFF = 0.5
+        MAX_BACKOFF = 8.0
+        FALLBACK_TO_LOCAL = False
+        HEDGE_AFTER = None
+
+    class Ingestion:
+        # Above 1, every worker holds the chunks of a whole document
+        WORKERS = 1
+        BATCH_SIZE = 256
+        SPLIT_WINDOW = 100_000
+        UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+    class Ocr:
+        ENABLED = True
+        MIN_TEXT_CHARS = 32
+        RENDER_SCALE = 300 / 72
+        LANGUAGE = "eng"
+        WORKERS = os.cpu_count()
+
+    class Cache:
+        EMBEDDINGS_MAX_ENTRIES = 500_000
+        OCR_MAX_ENTRIES = 100_000
+        TRANSLATIONS_MAX_ENTRIES = 100_000
+        LLM_RESPONSES_MAX_ENTRIES = 50_000
+        CHAINS_MAX_ENTRIES = 16
+        CHAINS_MAX_BYTES = 2 * 1024**3
 
     class Retriever:
         USE_RERANKER = True
+        SEARCH_K = 5
+        USE_HYBRID = True
+        RRF_K = 60
+        KEYWORD_MAX_WORDS = 3
+        RERANK_POOL_SIZE = 50
+        RERANK_STEP = 10
+        RERANK_TOP_N = 3
+        RERANK_PLATEAU = 0.01
         USE_CHAIN_FILTER = False
+        CHAIN_FILTER_BATCHED = False
+        CHAIN_FILTER_CONCURRENCY = 5
+        CHAIN_FILTER_TIMEOUT = 5.0
+        USE_CACHE = True
+        CACHE_MAX_ENTRIES = 1024
+        CACHE_TTL = 60 * 60
+
+    class Chain:
+        CONTEXT_MAX_TOKENS = 3000
+        CHARS_PER_TOKEN = 4
+        DUPLICATE_THRESHOLD = 0.8
+
+    class History:
+        MAX_TURNS = 4
+        MAX_TOKENS = 1500
+        SUMMARIZE = True
+        SUMMARY_BACKOFF = 5.0
+        SUMMARY_MAX_BACKOFF = 300.0
+
+    class Session:
+        PERSIST = False
+        MAX_SESSIONS = 1000
+        TTL = 24 * 60 * 60
+        FLUSH_INTERVAL = 2.0
+
+    class QuickActions:
+        PRECOMPUTE = True
+
+    class Streaming:
+        FLUSH_INTERVAL = 0.05
+        FLUSH_CHARACTERS = 256
+
+    class Metrics:
+        ENABLED = True
+        FILE = os.getenv("RAGBASE_METRICS_FILE")
+
+    class Server:
+        HOST = os.getenv("RAGBASE_HOST", "127.0.0.1")
+        PORT = int(os.getenv("RAGBASE_PORT", "8000"))
+        MAX_UPLOAD_BYTES = 512 * 1024**2
 
     DEBUG = False
-    CONVERSATION_MESSAGES_LIMIT = 10
+    # Without summaries the earlier turns are dropped from the prompt
+    CONVERSATION_MESSAGES_LIMIT = 0 if History.SUMMARIZE else 10
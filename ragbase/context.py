@@ -0,0 +1,100 @@
+import re
+from typing import Dict, List, Set, Tuple
+
+from langchain_core.documents import Document
+
+from ragbase.config import Config
+
+SHINGLE_SIZE = 5
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // Config.Chain.CHARS_PER_TOKEN + 1
+
+
+def _shingles(text: str) -> Set[Tuple[str, ...]]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {tuple(words)}
+    return {
+        tuple(words[i : i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def _containment(a: Set[tuple], b: Set[tuple]) -> float:
+    if not a:
+        return 1.0
+    return len(a & b) / len(a)
+
+
+def _score(document: Document, position: int, count: int) -> float:
+    # Retrieval order is the fallback when the reranker did not run
+    return document.metadata.get("relevance_score", (count - position) / count)
+
+
+def merge_documents(documents: List[Document]) -> List[Document]:
+    groups: Dict[str, List[Tuple[int, Document, float]]] = {}
+    for position, document in enumerate(documents):
+        score = _score(document, position, len(documents))
+        source = document.metadata.get("source_hash")
+        if source is None or "start_index" not in document.metadata:
+            source = f"document-{position}"
+        groups.setdefault(source, []).append(
+            (document.metadata.get("start_index", 0), document, score)
+        )
+
+    merged = []
+    for group in groups.values():
+        group.sort(key=lambda item: item[0])
+        start, current, score = group[0]
+        text = current.page_content
+        for next_start, document, next_score in group[1:]:
+            end = start + len(text)
+            if next_start <= end:
+                text += document.page_content[end - next_start :]
+                score = max(score, next_score)
+            elif next_start == end + 1:
+                text += "\n" + document.page_content
+                score = max(score, next_score)
+            else:
+                merged.append(_merged_document(current, text, score))
+                start, current, score = next_start, document, next_score
+                text = current.page_content
+        merged.append(_merged_document(current, text, score))
+    return sorted(merged, key=lambda doc: doc.metadata["relevance_score"], reverse=True)
+
+
+def _merged_document(document: Document, text: str, score: float) -> Document:
+    return Document(
+        page_content=text, metadata={**document.metadata, "relevance_score": score}
+    )
+
+
+def pack_documents(
+    documents: List[Document], max_tokens: int = Config.Chain.CONTEXT_MAX_TOKENS
+) -> List[Document]:
+    packed, packed_shingles = [], []
+    budget = max_tokens
+    for document in merge_documents(documents):
+        shingles = _shingles(document.page_content)
+        if any(
+            _containment(shingles, other) >= Config.Chain.DUPLICATE_THRESHOLD
+            for other in packed_shingles
+        ):
+            continue
+        tokens = estimate_tokens(document.page_content)
+        if tokens > budget:
+            if packed:
+                continue
+            # Never send an empty context: truncate the best document instead
+            document = Document(
+                page_content=document.page_content[
+                    : budget * Config.Chain.CHARS_PER_TOKEN
+                ],
+                metadata=document.metadata,
+            )
+            tokens = budget
+        packed.append(document)
+        packed_shingles.append(shingles)
+        budget -= tokens
+    return packed
@@ -0,0 +1,113 @@
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_qdrant import Qdrant
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from ragbase.config import Config
+from ragbase.keyword_index import close_keyword_index
+
+_clients: Dict[Path, QdrantClient] = {}
+_clients_lock = threading.Lock()
+
+
+def _database_dir(database_dir: Optional[Path]) -> Path:
+    return Path(database_dir or Config.Path.DATABASE_DIR)
+
+
+def manifest_file(database_dir: Optional[Path] = None) -> Path:
+    if database_dir is None:
+        return Config.Path.MANIFEST_FILE
+    return Path(database_dir) / "manifest.json"
+
+
+def get_client(database_dir: Optional[Path] = None) -> QdrantClient:
+    database_dir = _database_dir(database_dir)
+    with _clients_lock:
+        if database_dir not in _clients:
+            database_dir.mkdir(parents=True, exist_ok=True)
+            _clients[database_dir] = QdrantClient(path=str(database_dir))
+        return _clients[database_dir]
+
+
+def delete_database(database_dir: Path):
+    # Qdrant local mode keeps every point in memory, even deleted ones, until
+    # its client is closed
+    database_dir = Path(database_dir)
+    with _clients_lock:
+        client = _clients.pop(database_dir, None)
+    if client is not None:
+        client.close()
+    close_keyword_index(database_dir)
+    shutil.rmtree(database_dir, ignore_errors=True)
+
+
+def collection_version(database_dir: Optional[Path] = None) -> str:
+    try:
+        stat = manifest_file(database_dir).stat()
+    except FileNotFoundError:
+        return "empty"
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def vector_size(database_dir: Optional[Path] = None) -> int:
+    collection = get_client(database_dir).get_collection(
+        Config.Database.DOCUMENTS_COLLECTION
+    )
+    return collection.config.params.vectors.size
+
+
+def source_filter(source_hashes: List[str]) -> models.Filter:
+    return models.Filter(
+        must=[
+            models.FieldCondition(
+                key="metadata.source_hash",
+                match=models.MatchAny(any=list(source_hashes)),
+            )
+        ]
+    )
+
+
+def create_vector_store(
+    embeddings: Embeddings, database_dir: Optional[Path] = None
+) -> Qdrant:
+    client = get_client(database_dir)
+    collection_name = Config.Database.DOCUMENTS_COLLECTION
+    if not client.collection_exists(collection_name):
+        client.create_collection(
+            collection_name=collection_name,
+            vectors_config=models.VectorParams(
+                size=len(embeddings.embed_query("")),
+                distance=models.Distance.COSINE,
+            ),
+        )
+    return Qdrant(client=client, collection_name=collection_name, embeddings=embeddings)
+
+
+def upsert_documents(
+    vector_store: Qdrant,
+    documents: List[Document],
+    ids: List[str],
+    vectors: List[List[float]],
+):
+    if not documents:
+        return
+    points = [
+        models.PointStruct(
+            id=point_id,
+            vector=vector,
+            payload={
+                vector_store.content_payload_key: document.page_content,
+                vector_store.metadata_payload_key: document.metadata,
+            },
+        )
+        for point_id, vector, document in zip(ids, vectors, documents)
+    ]
+    vector_store.client.upsert(
+        collection_name=vector_store.collection_name, points=points
+    )
@@ -0,0 +1,158 @@
+import hashlib
+import multiprocessing
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import List, Optional
+
+from fastembed import TextEmbedding
+from langchain_core.embeddings import Embeddings
+
+from ragbase.cache import SqliteCache, TTLCache
+from ragbase.config import Config
+from ragbase.metrics import metrics
+
+
+@lru_cache(maxsize=None)
+def get_embeddings_cache() -> SqliteCache:
+    return SqliteCache(
+        Config.Path.CACHE_DIR / "embeddings.sqlite",
+        max_entries=Config.Cache.EMBEDDINGS_MAX_ENTRIES,
+    )
+
+
+_worker_model: Optional[TextEmbedding] = None
+
+
+def _init_worker(model_name: str, threads: Optional[int]):
+    global _worker_model
+    _worker_model = TextEmbedding(model_name=model_name, threads=threads)
+
+
+def _embed_shard(texts: List[str]) -> List[List[float]]:
+    return [vector.tolist() for vector in _worker_model.embed(texts, len(texts))]
+
+
+class FastEmbedEngine(Embeddings):
+    def __init__(
+        self,
+        model_name: str = Config.Model.EMBEDDINGS,
+        batch_size: int = Config.Model.EMBEDDING_BATCH_SIZE,
+        workers: int = Config.Model.EMBEDDING_WORKERS,
+        threads: Optional[int] = Config.Model.EMBEDDING_THREADS,
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.workers = workers
+        self.threads = threads
+        self.model = TextEmbedding(model_name=model_name, threads=threads)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_name, self.threads),
+            )
+        return self._executor
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.workers <= 1 or len(texts) <= self.batch_size:
+            return [
+                vector.tolist()
+                for vector in self.model.embed(texts, batch_size=self.batch_size)
+            ]
+
+        # Shard the batch across the pool; map keeps the input order
+        shards = [
+            texts[start : start + self.batch_size]
+            for start in range(0, len(texts), self.batch_size)
+        ]
+        return [
+            vector
+            for vectors in self._get_executor().map(_embed_shard, shards)
+            for vector in vectors
+        ]
+
+    def embed_query(self, text: str) -> List[float]:
+        return next(iter(self.model.query_embed(text))).tolist()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+@lru_cache(maxsize=None)
+def get_query_embeddings_cache() -> TTLCache:
+    return TTLCache(
+        max_entries=Config.Retriever.CACHE_MAX_ENTRIES, ttl=Config.Retriever.CACHE_TTL
+    )
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, embeddings: Embeddings, model_name: str, cache: SqliteCache):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache
+
+    def _key(self, kind: str, text: str) -> str:
+        normalized = normalize_text(text)
+        return hashlib.sha256(
+            f"{self.model_name}\0{kind}\0{normalized}".encode("utf-8")
+        ).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key("document", text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = {
+                key: array("f", vector).tobytes()
+                for key, vector in zip(missing.keys(), vectors)
+            }
+            self.cache.set_many(computed)
+            cached.update(computed)
+
+        return [array("f", cached[key]).tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key("query", text)
+        memoized = get_query_embeddings_cache().get(key)
+        if memoized is not None:
+            return list(memoized)
+
+        value = self.cache.get(key)
+        if value is None:
+            start_time = time.perf_counter()
+            vector = self.embeddings.embed_query(text)
+            metrics.observe(
+                "ragbase_stage_seconds",
+                time.perf_counter() - start_time,
+                stage="query_embed",
+            )
+            value = array("f", vector).tobytes()
+            self.cache.set(key, value)
+        vector = array("f", value).tolist()
+        get_query_embeddings_cache().set(key, tuple(vector))
+        return vector
+
+    @property
+    def hits(self) -> int:
+        return self.cache.hits
+
+    @property
+    def misses(self) -> int:
+        return self.cache.misses
@@ -1,19 +1,89 @@
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import List
+from typing import Iterable, Iterator, List, Optional, Tuple
 
-from langchain_community.document_loaders import PyPDFium2Loader
-from langchain_community.embeddings.fastembed import FastEmbedEmbeddings
+from langchain_core.documents import Document
 from langchain_core.vectorstores import VectorStore
 from langchain_experimental.text_splitter import SemanticChunker
-from langchain_qdrant import Qdrant
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from ragbase.config import Config
+from ragbase.database import (
+    create_vector_store,
+    manifest_file,
+    upsert_documents,
+    vector_size,
+)
+from ragbase.keyword_index import get_keyword_index
+from ragbase.loader import load_pdf
+from ragbase.manifest import IngestionManifest, chunk_id, file_digest
+from ragbase.model import create_embeddings
+from ragbase.progress import IngestionEvent, ProgressCallback
+
+_worker_ingestor: Optional["Ingestor"] = None
+_ingest_lock = threading.Lock()
+
+
+def _init_worker():
+    global _worker_ingestor
+    _worker_ingestor = Ingestor()
+
+
+def _split_document(
+    job: Tuple[str, Path],
+) -> Tuple[List[Document], List[IngestionEvent]]:
+    source_hash, doc_path = job
+    events = []
+    documents = list(_worker_ingestor.split(doc_path, source_hash, events.append))
+    return documents, events
+
+
+def _batched(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _page_windows(
+    pages: Iterator[Document], max_characters: int
+) -> Iterator[Tuple[List[Document], float]]:
+    window, characters, seconds = [], 0, 0.0
+    while True:
+        start_time = time.perf_counter()
+        page = next(pages, None)
+        seconds += time.perf_counter() - start_time
+        if page is None:
+            break
+        window.append(page)
+        characters += len(page.page_content)
+        if characters >= max_characters:
+            yield window, seconds
+            window, characters, seconds = [], 0, 0.0
+    if window:
+        yield window, seconds
+
+
+def _with_last(iterable: Iterable) -> Iterator[Tuple[object, bool]]:
+    iterator = iter(iterable)
+    try:
+        previous = next(iterator)
+    except StopIteration:
+        return
+    for item in iterator:
+        yield previous, False
+        previous = item
+    yield previous, True
 
 
 class Ingestor:
-    def __init__(self):
-        self.embeddings = FastEmbedEmbeddings(model_name=Config.Model.EMBEDDINGS)
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or Config.Ingestion.WORKERS
+        self.embeddings = create_embeddings()
         self.semantic_splitter = SemanticChunker(
             self.embeddings, breakpoint_threshold_type="interquartile"
         )
@@ -23,19 +93,200 @@ class Ingestor:
             add_start_index=True,
         )
 
-    def ingest(self, doc_paths: List[Path]) -> VectorStore:
-        documents = []
-        for doc_path in doc_paths:
-            loaded_documents = PyPDFium2Loader(doc_path).load()
-            document_text = "\n".join([doc.page_content for doc in loaded_documents])
-            documents.extend(
-                self.recursive_splitter.split_documents(
-                    self.semantic_splitter.create_documents([document_text])
-                )
+    def split(
+        self,
+        doc_path: Path,
+        source_hash: str,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> Iterator[Document]:
+        source = Path(doc_path).name
+        pages_done = 0
+        page_count = 0
+
+        def emit(stage: str, items: int, seconds: float):
+            if on_progress:
+                event = IngestionEvent(stage, source, items, seconds)
+                if page_count:
+                    event.document_fraction = pages_done / page_count
+                on_progress(event)
+
+        # Pages are split in windows of text; the last semantic chunk of a
+        # window may be cut short, so it is carried over into the next one.
+        # The breakpoint threshold is still computed per window, so chunks
+        # only approximate those of a split of the whole document
+        pages = load_pdf(Path(doc_path))
+        windows = _page_windows(pages, Config.Ingestion.SPLIT_WINDOW)
+        carry = ""
+        offset = 0
+        for (window, load_seconds), is_last in _with_last(windows):
+            page_count = window[0].metadata["pages"]
+            emit("load", len(window), load_seconds)
+            ocr_seconds = [
+                page.metadata["ocr_seconds"]
+                for page in window
+                if "ocr_seconds" in page.metadata
+            ]
+            emit("ocr", len(ocr_seconds), sum(ocr_seconds))
+
+            start_time = time.perf_counter()
+            window_text = "\n".join([carry] + [page.page_content for page in window])
+            semantic_documents = self.semantic_splitter.create_documents(
+                [window_text.lstrip("\n")]
             )
-        return Qdrant.from_documents(
-            documents=documents,
-            embedding=self.embeddings,
-            path=Config.Path.DATABASE_DIR,
-            collection_name=Config.Database.DOCUMENTS_COLLECTION,
-        )
+            carry = ""
+            if not is_last and len(semantic_documents) > 1:
+                carry = semantic_documents.pop().page_content
+            emit(
+                "semantic_split",
+                len(semantic_documents),
+                time.perf_counter() - start_time,
+            )
+
+            # start_index is made relative to the sequence of semantic chunks,
+            # so overlapping and adjacent chunks can be merged at query time
+            start_time = time.perf_counter()
+            documents = []
+            for semantic_document in semantic_documents:
+                for document in self.recursive_splitter.split_documents(
+                    [semantic_document]
+                ):
+                    document.metadata["start_index"] += offset
+                    documents.append(document)
+                offset += len(semantic_document.page_content) + 1
+            emit("recursive_split", len(documents), time.perf_counter() - start_time)
+
+            for document in documents:
+                document.metadata["source"] = source
+                document.metadata["source_hash"] = source_hash
+                yield document
+            pages_done += len(window)
+
+    def split_all(
+        self,
+        jobs: List[Tuple[str, Path]],
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> Iterator[Iterator[Document]]:
+        if self.workers <= 1 or len(jobs) <= 1:
+            for source_hash, doc_path in jobs:
+                yield self.split(doc_path, source_hash, on_progress)
+            return
+
+        # Only a bounded number of documents is split ahead of the upserts, but
+        # each worker returns all the chunks of a document at once: memory
+        # grows with document size times workers, not with the batch size
+        with ProcessPoolExecutor(
+            max_workers=min(self.workers, len(jobs)),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        ) as executor:
+            pending_jobs = iter(jobs)
+            futures = deque(
+                executor.submit(_split_document, job)
+                for job in islice(pending_jobs, self.workers)
+            )
+            while futures:
+                documents, events = futures.popleft().result()
+                for job in islice(pending_jobs, 1):
+                    futures.append(executor.submit(_split_document, job))
+                if on_progress:
+                    for event in events:
+                        on_progress(event)
+                yield iter(documents)
+
+    def ingest(
+        self,
+        doc_paths: List[Path],
+        prune: bool = True,
+        on_progress: Optional[ProgressCallback] = None,
+        database_dir: Optional[Path] = None,
+    ) -> VectorStore:
+        with _ingest_lock:
+            return self._ingest(doc_paths, prune, on_progress, database_dir)
+
+    def _ingest(
+        self,
+        doc_paths: List[Path],
+        prune: bool,
+        on_progress: Optional[ProgressCallback],
+        database_dir: Optional[Path],
+    ) -> VectorStore:
+        vector_store = create_vector_store(self.embeddings, database_dir)
+        vector_bytes = 4 * vector_size(database_dir)
+        manifest = IngestionManifest(manifest_file(database_dir))
+        keyword_index = get_keyword_index(database_dir)
+        doc_hashes = {file_digest(doc_path): doc_path for doc_path in doc_paths}
+
+        if prune:
+            removed_hashes = [h for h in manifest.documents if h not in doc_hashes]
+            for source_hash in removed_hashes:
+                vector_store.delete(ids=manifest.remove(source_hash))
+                keyword_index.remove(source_hash)
+            # The points are gone, a failing document must not leave them listed
+            manifest.save()
+
+        # Documents ingested before the keyword index existed are indexed
+        # again, their embeddings come from the cache. The manifest records
+        # it, so documents without any chunks are not split on every run
+        jobs = [
+            (source_hash, doc_path)
+            for source_hash, doc_path in doc_hashes.items()
+            if not manifest.keyword_indexed(source_hash)
+        ]
+        completed = 0
+        document_fraction = 0.0
+
+        def emit(event: IngestionEvent):
+            nonlocal document_fraction
+            if on_progress:
+                # Embed and upsert events keep the page share of the split
+                # events before them, so the fraction never goes backwards
+                document_fraction = max(document_fraction, event.document_fraction)
+                event.completed, event.total = completed, len(jobs)
+                event.document_fraction = document_fraction
+                on_progress(event)
+
+        for (source_hash, doc_path), documents in zip(jobs, self.split_all(jobs, emit)):
+            source = Path(doc_path).name
+            ids = []
+            size_bytes = 0
+            for batch in _batched(documents, Config.Ingestion.BATCH_SIZE):
+                batch_ids = [
+                    chunk_id(source_hash, len(ids) + position, doc.page_content)
+                    for position, doc in enumerate(batch)
+                ]
+
+                start_time = time.perf_counter()
+                vectors = self.embeddings.embed_documents(
+                    [doc.page_content for doc in batch]
+                )
+                emit(
+                    IngestionEvent(
+                        "embed", source, len(vectors), time.perf_counter() - start_time
+                    )
+                )
+
+                start_time = time.perf_counter()
+                upsert_documents(vector_store, batch, batch_ids, vectors)
+                keyword_index.add(source_hash, batch_ids, batch)
+                emit(
+                    IngestionEvent(
+                        "upsert",
+                        source,
+                        len(batch_ids),
+                        time.perf_counter() - start_time,
+                    )
+                )
+
+                ids.extend(batch_ids)
+                size_bytes += sum(
+                    len(doc.page_content.encode("utf-8")) + vector_bytes
+                    for doc in batch
+                )
+
+            manifest.add(source_hash, source, ids, size_bytes)
+            manifest.save()
+            completed += 1
+            document_fraction = 0.0
+
+        manifest.save()
+        return vector_store
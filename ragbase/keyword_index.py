@@ -0,0 +1,188 @@
+import json
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from ragbase.config import Config
+
+# Keeps clause numbers and hyphenated terms like 7.2(b) -> "7.2", "b" together
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+STOP_WORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i if in is it "
+    "its me my of on or our shall should that the their there this to was what "
+    "when where which who why will with would you your".split()
+)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        token
+        for token in TOKEN_PATTERN.findall(text.lower())
+        if token not in STOP_WORDS
+    ]
+
+
+class KeywordIndex:
+    """BM25 inverted index over the ingested chunks, stored in SQLite."""
+
+    def __init__(self, path: Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stats: Optional[Tuple[int, float]] = None
+        self._connection = sqlite3.connect(
+            str(path), timeout=30, check_same_thread=False
+        )
+        with self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS chunks (chunk_id TEXT PRIMARY KEY, "
+                "source_hash TEXT NOT NULL, length INTEGER NOT NULL, "
+                "content TEXT NOT NULL, metadata TEXT NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source_hash)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, "
+                "chunk_id TEXT NOT NULL, frequency INTEGER NOT NULL, "
+                "PRIMARY KEY (term, chunk_id)) WITHOUT ROWID"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS postings_chunk ON postings (chunk_id)"
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def add(self, source_hash: str, ids: List[str], documents: List[Document]):
+        chunks, postings = [], []
+        for chunk_id, document in zip(ids, documents):
+            terms = Counter(tokenize(document.page_content))
+            chunks.append(
+                (
+                    chunk_id,
+                    source_hash,
+                    sum(terms.values()),
+                    document.page_content,
+                    json.dumps(document.metadata),
+                )
+            )
+            postings.extend((term, chunk_id, count) for term, count in terms.items())
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?)", chunks
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO postings VALUES (?, ?, ?)", postings
+            )
+            self._stats = None
+
+    def remove(self, source_hash: str):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM postings WHERE chunk_id IN "
+                "(SELECT chunk_id FROM chunks WHERE source_hash = ?)",
+                (source_hash,),
+            )
+            self._connection.execute(
+                "DELETE FROM chunks WHERE source_hash = ?", (source_hash,)
+            )
+            self._stats = None
+
+    def _collection_stats(self) -> Tuple[int, float]:
+        if self._stats is None:
+            count, average_length = self._connection.execute(
+                "SELECT COUNT(*), AVG(length) FROM chunks"
+            ).fetchone()
+            self._stats = (count, average_length or 0.0)
+        return self._stats
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        source_hashes: Optional[Sequence[str]] = None,
+    ) -> List[Tuple[Document, float]]:
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        term_placeholders = ",".join("?" * len(terms))
+        sql = (
+            "SELECT p.term, p.chunk_id, p.frequency, c.length FROM postings p "
+            "JOIN chunks c ON c.chunk_id = p.chunk_id "
+            f"WHERE p.term IN ({term_placeholders})"
+        )
+        parameters = list(terms)
+        if source_hashes is not None:
+            sql += f" AND c.source_hash IN ({','.join('?' * len(source_hashes))})"
+            parameters.extend(source_hashes)
+
+        with self._lock:
+            count, average_length = self._collection_stats()
+            document_frequencies = dict(
+                self._connection.execute(
+                    "SELECT term, COUNT(*) FROM postings "
+                    f"WHERE term IN ({term_placeholders}) GROUP BY term",
+                    terms,
+                ).fetchall()
+            )
+            rows = self._connection.execute(sql, parameters).fetchall()
+
+        scores: Dict[str, float] = {}
+        for term, chunk_id, frequency, length in rows:
+            df = document_frequencies[term]
+            idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+            term_score = idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + term_score
+
+        top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        if not top:
+            return []
+        placeholders = ",".join("?" * len(top))
+        with self._lock:
+            chunks = {
+                chunk_id: (content, metadata)
+                for chunk_id, content, metadata in self._connection.execute(
+                    "SELECT chunk_id, content, metadata FROM chunks "
+                    f"WHERE chunk_id IN ({placeholders})",
+                    [chunk_id for chunk_id, _ in top],
+                ).fetchall()
+            }
+
+        results = []
+        for chunk_id, score in top:
+            content, metadata = chunks[chunk_id]
+            metadata = {**json.loads(metadata), "_id": chunk_id}
+            results.append((Document(page_content=content, metadata=metadata), score))
+        return results
+
+
+_indexes: Dict[Path, KeywordIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_keyword_index(database_dir: Optional[Path] = None) -> KeywordIndex:
+    database_dir = Path(database_dir or Config.Path.DATABASE_DIR)
+    with _indexes_lock:
+        if database_dir not in _indexes:
+            _indexes[database_dir] = KeywordIndex(database_dir / "keywords.sqlite")
+        return _indexes[database_dir]
+
+
+def close_keyword_index(database_dir: Path):
+    with _indexes_lock:
+        index = _indexes.pop(Path(database_dir), None)
+    if index is not None:
+        index.close()
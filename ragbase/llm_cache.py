@@ -0,0 +1,141 @@
+import hashlib
+import json
+import re
+from functools import lru_cache
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from ragbase.cache import SqliteCache
+from ragbase.config import Config
+from ragbase.llm_gateway import is_fallback
+
+TOKEN_PATTERN = re.compile(r"\s*\S+\s*|\s+")
+
+
+@lru_cache(maxsize=None)
+def get_llm_cache() -> SqliteCache:
+    return SqliteCache(
+        Config.Path.CACHE_DIR / "llm-responses.sqlite",
+        max_entries=Config.Cache.LLM_RESPONSES_MAX_ENTRIES,
+    )
+
+
+class CachedChatModel(BaseChatModel):
+    llm: BaseChatModel
+    response_cache: SqliteCache
+
+    @property
+    def _llm_type(self) -> str:
+        return f"cached-{self.llm._llm_type}"
+
+    def _key(self, messages: List[BaseMessage], stop: Optional[List[str]]) -> str:
+        prompt = {
+            "model": self.llm._llm_type,
+            "params": self.llm._identifying_params,
+            "stop": stop,
+            "messages": [(message.type, message.content) for message in messages],
+        }
+        return hashlib.sha256(
+            json.dumps(prompt, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+
+    def _cached(self, key: str) -> Optional[str]:
+        value = self.response_cache.get(key)
+        return None if value is None else value.decode("utf-8")
+
+    def _store(self, key: str, text: str):
+        if text:
+            self.response_cache.set(key, text.encode("utf-8"))
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        key = self._key(messages, stop)
+        text = self._cached(key)
+        if text is None:
+            message = self.llm.invoke(messages, stop=stop, **kwargs)
+            text = message.content
+            if not is_fallback(message):
+                self._store(key, text)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        key = self._key(messages, stop)
+        text = self._cached(key)
+        if text is None:
+            message = await self.llm.ainvoke(messages, stop=stop, **kwargs)
+            text = message.content
+            if not is_fallback(message):
+                self._store(key, text)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        key = self._key(messages, stop)
+        text = self._cached(key)
+        if text is not None:
+            chunks = (AIMessageChunk(content=token) for token in _tokens(text))
+        else:
+            chunks = self.llm.stream(messages, stop=stop, **kwargs)
+
+        parts, fallback = [], False
+        for chunk in chunks:
+            parts.append(chunk.content)
+            fallback = fallback or is_fallback(chunk)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.content)
+            yield ChatGenerationChunk(message=chunk)
+        if text is None and not fallback:
+            self._store(key, "".join(parts))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        key = self._key(messages, stop)
+        text = self._cached(key)
+        if text is not None:
+            for token in _tokens(text):
+                if run_manager:
+                    await run_manager.on_llm_new_token(token)
+                yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+            return
+
+        parts, fallback = [], False
+        async for chunk in self.llm.astream(messages, stop=stop, **kwargs):
+            parts.append(chunk.content)
+            fallback = fallback or is_fallback(chunk)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.content)
+            yield ChatGenerationChunk(message=chunk)
+        if not fallback:
+            self._store(key, "".join(parts))
+
+
+def _tokens(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text)
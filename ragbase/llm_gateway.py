@@ -0,0 +1,295 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, List, Optional, Tuple
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from ragbase.config import Config
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError", "ConnectError"}
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    return status_code
+
+
+def is_throttled(error: Exception) -> bool:
+    return _status_code(error) == 429
+
+
+def is_retryable(error: Exception) -> bool:
+    return (
+        _status_code(error) in RETRYABLE_STATUS_CODES
+        or type(error).__name__ in RETRYABLE_ERRORS
+        or isinstance(error, (TimeoutError, ConnectionError))
+    )
+
+
+def _mark_fallback(message: BaseMessage) -> BaseMessage:
+    # Cached responses are keyed by the primary model, answers of the fallback
+    # model are marked so they are not stored under that key
+    return message.copy(
+        update={"response_metadata": {**message.response_metadata, "fallback": True}}
+    )
+
+
+def is_fallback(message: BaseMessage) -> bool:
+    return bool(message.response_metadata.get("fallback"))
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimiter:
+    """Concurrency limit with additive increase and multiplicative decrease.
+
+    The limit grows by about one slot per window of successful calls and is
+    halved when the backend throttles. Waiters are woken in FIFO order and
+    may be threads or coroutines on any event loop.
+    """
+
+    def __init__(self, initial: int, maximum: int, minimum: int = 1):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(initial)
+        self.active = 0
+        self.throttled = 0
+        self._waiters: deque[Callable[[], None]] = deque()
+        self._lock = threading.Lock()
+
+    def _acquire_or_enqueue(self, wake: Callable[[], None]) -> bool:
+        with self._lock:
+            if not self._waiters and self.active < int(self.limit):
+                self.active += 1
+                return True
+            self._waiters.append(wake)
+            return False
+
+    def acquire(self):
+        event = threading.Event()
+        if not self._acquire_or_enqueue(event.set):
+            event.wait()
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(
+                lambda: granted.done() or granted.set_result(None)
+            )
+
+        if self._acquire_or_enqueue(wake):
+            return
+        try:
+            await granted
+        except asyncio.CancelledError:
+            with self._lock:
+                if wake in self._waiters:
+                    self._waiters.remove(wake)
+                    raise
+            # The slot was handed over while the waiter was being cancelled
+            self.release()
+            raise
+
+    def release(self, error: Optional[Exception] = None):
+        with self._lock:
+            self.active -= 1
+            if error is None:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            elif is_throttled(error):
+                self.throttled += 1
+                self.limit = max(self.minimum, self.limit / 2)
+            while self._waiters and self.active < int(self.limit):
+                self.active += 1
+                self._waiters.popleft()()
+
+
+@lru_cache(maxsize=None)
+def get_limiter(name: str) -> AdaptiveLimiter:
+    return AdaptiveLimiter(
+        initial=Config.Gateway.INITIAL_CONCURRENCY,
+        maximum=Config.Gateway.MAX_CONCURRENCY,
+    )
+
+
+class GatewayChatModel(BaseChatModel):
+    llm: BaseChatModel
+    limiter: AdaptiveLimiter
+    fallback: Optional[BaseChatModel] = None
+    max_retries: int = Config.Gateway.MAX_RETRIES
+    backoff: float = Config.Gateway.BACKOFF
+    max_backoff: float = Config.Gateway.MAX_BACKOFF
+    hedge_after: Optional[float] = Config.Gateway.HEDGE_AFTER
+
+    @property
+    def _llm_type(self) -> str:
+        return f"gateway-{self.llm._llm_type}"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return self.llm._identifying_params
+
+    def _delay(self, attempt: int, error: Exception) -> float:
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        delay = min(self.max_backoff, self.backoff * 2**attempt)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                message = self.llm.invoke(messages, stop=stop, **kwargs)
+            except Exception as e:
+                self.limiter.release(e)
+                if not is_retryable(e):
+                    raise
+                if attempt == self.max_retries or (
+                    self.fallback is not None and is_throttled(e)
+                ):
+                    if self.fallback is None:
+                        raise
+                    message = _mark_fallback(
+                        self.fallback.invoke(messages, stop=stop, **kwargs)
+                    )
+                    break
+                time.sleep(self._delay(attempt, e))
+            else:
+                self.limiter.release()
+                break
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        chunks = [
+            chunk
+            async for chunk in self._astream(messages, stop, run_manager, **kwargs)
+        ]
+        text = "".join(chunk.message.content for chunk in chunks)
+        message = AIMessage(content=text)
+        if any(is_fallback(chunk.message) for chunk in chunks):
+            message = _mark_fallback(message)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream_primary(
+        self, messages: List[BaseMessage], **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        # Calls are only retried before the first chunk, a partial answer
+        # can't be taken back from the caller
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.aacquire()
+            started = False
+            try:
+                async for chunk in self.llm.astream(messages, **kwargs):
+                    started = True
+                    yield ChatGenerationChunk(message=chunk)
+            except Exception as e:
+                self.limiter.release(e)
+                if started or not is_retryable(e):
+                    raise
+                if attempt == self.max_retries or (
+                    self.fallback is not None and is_throttled(e)
+                ):
+                    raise
+                await asyncio.sleep(self._delay(attempt, e))
+            except BaseException:
+                self.limiter.release()
+                raise
+            else:
+                self.limiter.release()
+                return
+
+    async def _astream_fallback(
+        self, messages: List[BaseMessage], **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        async for chunk in self.fallback.astream(messages, **kwargs):
+            yield ChatGenerationChunk(message=_mark_fallback(chunk))
+
+    async def _first_chunk(
+        self, messages: List[BaseMessage], **kwargs: Any
+    ) -> Tuple[AsyncIterator[ChatGenerationChunk], Optional[ChatGenerationChunk]]:
+        # The fallback is started when the primary model fails or, if hedging
+        # is enabled, hasn't produced a chunk in time; the first to answer wins
+        primary = self._astream_primary(messages, **kwargs)
+        pending = {asyncio.ensure_future(anext(primary, None)): primary}
+        started_fallback = self.fallback is None
+        winner, losers, error = None, [], None
+
+        def start_fallback():
+            stream = self._astream_fallback(messages, **kwargs)
+            pending[asyncio.ensure_future(anext(stream, None))] = stream
+
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=None if started_fallback else self.hedge_after,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    stream = pending.pop(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif winner is None:
+                        winner = (stream, task.result())
+                    else:
+                        losers.append(stream)
+                if winner is not None:
+                    return winner
+                if not started_fallback:
+                    started_fallback = True
+                    start_fallback()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for stream in losers + list(pending.values()):
+                await stream.aclose()
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        kwargs["stop"] = stop
+        stream, chunk = await self._first_chunk(messages, **kwargs)
+        while chunk is not None:
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text)
+            yield chunk
+            chunk = await anext(stream, None)
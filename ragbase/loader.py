@@ -0,0 +1,97 @@
+import hashlib
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple, Union
+
+import pypdfium2 as pdfium
+import pytesseract
+from langchain_core.documents import Document
+from PIL.Image import Image
+
+from ragbase.cache import SqliteCache
+from ragbase.config import Config
+
+PageResult = Tuple[str, Optional[float]]
+
+
+@lru_cache(maxsize=None)
+def get_ocr_cache() -> SqliteCache:
+    return SqliteCache(
+        Config.Path.CACHE_DIR / "ocr.sqlite",
+        max_entries=Config.Cache.OCR_MAX_ENTRIES,
+    )
+
+
+def needs_ocr(text: str) -> bool:
+    return len(text.strip()) < Config.Ocr.MIN_TEXT_CHARS
+
+
+def _ocr_image(image: Image, key: str) -> PageResult:
+    start_time = time.perf_counter()
+    text = pytesseract.image_to_string(image, lang=Config.Ocr.LANGUAGE)
+    get_ocr_cache().set(key, text.encode("utf-8"))
+    return text, time.perf_counter() - start_time
+
+
+def _ocr_page(
+    executor: ThreadPoolExecutor, page: pdfium.PdfPage
+) -> Union[PageResult, Future]:
+    bitmap = page.render(scale=Config.Ocr.RENDER_SCALE, grayscale=True)
+    image = bitmap.to_pil().copy()
+    bitmap.close()
+    key = hashlib.sha256(
+        f"{Config.Ocr.LANGUAGE}:{image.size}:".encode("utf-8") + image.tobytes()
+    ).hexdigest()
+    cached = get_ocr_cache().get(key)
+    if cached is not None:
+        return cached.decode("utf-8"), 0.0
+    return executor.submit(_ocr_image, image, key)
+
+
+def load_pdf(source: Union[Path, bytes]) -> Iterator[Document]:
+    workers = Config.Ocr.WORKERS or os.cpu_count() or 1
+    metadata = {"source": str(source)} if isinstance(source, Path) else {}
+    pdf = pdfium.PdfDocument(source)
+    metadata["pages"] = len(pdf)
+    pending = deque()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for page_number in range(len(pdf)):
+                page = pdf[page_number]
+                text_page = page.get_textpage()
+                text = text_page.get_text_bounded()
+                text_page.close()
+                if Config.Ocr.ENABLED and needs_ocr(text):
+                    result = _ocr_page(executor, page)
+                else:
+                    result = (text, None)
+                page.close()
+
+                pending.append((page_number, result))
+                while len(pending) > workers:
+                    yield _page_document(*pending.popleft(), metadata)
+            while pending:
+                yield _page_document(*pending.popleft(), metadata)
+    finally:
+        pdf.close()
+
+
+def _page_document(
+    page_number: int, result: Union[PageResult, Future], metadata: dict
+) -> Document:
+    if isinstance(result, Future):
+        result = result.result()
+    text, ocr_seconds = result
+    metadata = {**metadata, "page": page_number}
+    if ocr_seconds is not None:
+        metadata["ocr_seconds"] = ocr_seconds
+    return Document(page_content=text, metadata=metadata)
+
+
+def load_pdf_text(source: Union[Path, bytes]) -> str:
+    pages: List[str] = [doc.page_content for doc in load_pdf(source)]
+    return "\n".join(pages)
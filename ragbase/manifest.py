@@ -0,0 +1,63 @@
+import hashlib
+import json
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Dict, List
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def stream_digest(stream: BinaryIO) -> str:
+    digest = hashlib.sha256()
+    while block := stream.read(HASH_BLOCK_SIZE):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    with Path(path).open("rb") as f:
+        return stream_digest(f)
+
+
+def chunk_id(source_hash: str, position: int, text: str) -> str:
+    digest = hashlib.sha256(f"{source_hash}:{position}:{text}".encode("utf-8"))
+    return str(uuid.uuid5(uuid.NAMESPACE_OID, digest.hexdigest()))
+
+
+class IngestionManifest:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.documents: Dict[str, dict] = {}
+        if self.path.exists():
+            self.documents = json.loads(self.path.read_text())["documents"]
+
+    def __contains__(self, source_hash: str) -> bool:
+        return source_hash in self.documents
+
+    def add(self, source_hash: str, name: str, chunk_ids: List[str], size_bytes: int):
+        self.documents[source_hash] = {
+            "name": name,
+            "chunk_ids": chunk_ids,
+            "size_bytes": size_bytes,
+            "keyword_indexed": True,
+        }
+
+    def keyword_indexed(self, source_hash: str) -> bool:
+        document = self.documents.get(source_hash)
+        return document is not None and document.get("keyword_indexed", False)
+
+    def size_bytes(self, source_hashes: List[str]) -> int:
+        return sum(
+            self.documents[source_hash].get("size_bytes", 0)
+            for source_hash in source_hashes
+            if source_hash in self.documents
+        )
+
+    def remove(self, source_hash: str) -> List[str]:
+        return self.documents.pop(source_hash)["chunk_ids"]
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"documents": self.documents}, indent=2))
+        tmp_path.replace(self.path)
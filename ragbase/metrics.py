@@ -0,0 +1,320 @@
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.documents import Document
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+RATE_BUCKETS = (1, 5, 10, 25, 50, 100, 200, 500, 1000)
+SCORE_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+CANDIDATE_BUCKETS = (5, 10, 20, 30, 40, 50, 75, 100)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, buckets: Sequence[float]):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self._series: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, labels: Labels):
+        counts, totals = self._series.setdefault(
+            labels, ([0] * (len(self.buckets) + 1), [0.0])
+        )
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+        counts[-1] += 1
+        totals[0] += value
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for labels, (counts, totals) in sorted(self._series.items()):
+            for bound, count in zip(self.buckets, counts):
+                bucket = _format_labels(labels, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{bucket} {count}")
+            bucket = _format_labels(labels, ("le", "+Inf"))
+            lines.append(f"{self.name}_bucket{bucket} {counts[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {totals[0]}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {counts[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._series: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels, value: float = 1):
+        self._series[labels] = self._series.get(labels, 0) + value
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} counter",
+        ]
+        for labels, value in sorted(self._series.items()):
+            lines.append(f"{self.name}_total{_format_labels(labels)} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, description: str, buckets=LATENCY_BUCKETS):
+        with self._lock:
+            return self._metrics.setdefault(name, Histogram(name, description, buckets))
+
+    def counter(self, name: str, description: str) -> Counter:
+        with self._lock:
+            return self._metrics.setdefault(name, Counter(name, description))
+
+    def observe(self, name: str, value: float, **labels: str):
+        with self._lock:
+            self._metrics[name].observe(value, tuple(sorted(labels.items())))
+
+    def inc(self, name: str, value: float = 1, **labels: str):
+        with self._lock:
+            self._metrics[name].inc(tuple(sorted(labels.items())), value)
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        with self._lock:
+            lines = [
+                line
+                for _, metric in sorted(self._metrics.items())
+                for line in metric.render()
+            ]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Path):
+        # Written atomically for the node exporter textfile collector
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        tmp_path.write_text(self.render(), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+
+metrics = MetricsRegistry()
+metrics.histogram("ragbase_stage_seconds", "Time spent in each stage of a question")
+metrics.histogram(
+    "ragbase_llm_time_to_first_token_seconds", "Time until the first answer token"
+)
+metrics.histogram(
+    "ragbase_llm_tokens_per_second", "Answer streaming rate", buckets=RATE_BUCKETS
+)
+metrics.histogram(
+    "ragbase_relevance_score",
+    "Reranker score of the retrieved documents",
+    buckets=SCORE_BUCKETS,
+)
+metrics.histogram(
+    "ragbase_rerank_candidates",
+    "Candidates reranked before the scores plateaued",
+    buckets=CANDIDATE_BUCKETS,
+)
+metrics.counter("ragbase_questions", "Answered questions")
+metrics.counter(
+    "ragbase_keyword_only_queries", "Queries answered from the keyword index alone"
+)
+
+
+@dataclass
+class _Run:
+    name: str
+    stage: Optional[str]
+    parent_run_id: Optional[UUID]
+    start: float = field(default_factory=time.perf_counter)
+    child_seconds: float = 0.0
+    first_token: Optional[float] = None
+    tokens: int = 0
+
+
+class StageTimingHandler(BaseCallbackHandler):
+    """Records per-stage timings of a QA chain run into the metrics registry.
+
+    Retriever stages are taken from the "stage" metadata set in
+    create_retriever and timed without their nested retrievers, so rerank
+    and chain filter times exclude the vector search.
+    """
+
+    run_inline = True
+
+    def __init__(self, registry: MetricsRegistry = metrics):
+        self.registry = registry
+        self.timings: Dict[str, float] = {}
+        self._runs: Dict[UUID, _Run] = {}
+        self._parents: Dict[UUID, Optional[UUID]] = {}
+
+    def _start(
+        self,
+        run_id: UUID,
+        parent_run_id: Optional[UUID],
+        name: str,
+        metadata: Optional[Dict[str, Any]],
+    ):
+        stage = (metadata or {}).get("stage")
+        self._runs[run_id] = _Run(name=name, stage=stage, parent_run_id=parent_run_id)
+
+    def _enclosing_run(self, run_id: Optional[UUID]) -> Optional[_Run]:
+        # Retriever metadata isn't inherited by child runs, so the stage or
+        # LLM call a run belongs to is found by walking up its parents
+        while run_id is not None:
+            run = self._runs.get(run_id)
+            if run is not None and (run.stage or run.name == "llm"):
+                return run
+            run_id = self._parents.get(run_id)
+        return None
+
+    def _wraps_active_llm(self, parent_run_id: Optional[UUID]) -> bool:
+        # The cache and the gateway call the models they wrap with the
+        # callbacks of the enclosing chain, so those runs are siblings of the
+        # outer model's run rather than its children
+        return any(
+            run.name == "llm" and run.parent_run_id == parent_run_id
+            for run in self._runs.values()
+        )
+
+    def _record(self, stage: str, seconds: float):
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+        self.registry.observe("ragbase_stage_seconds", seconds, stage=stage)
+
+    def on_retriever_start(
+        self,
+        serialized: Dict[str, Any],
+        query: str,
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ):
+        self._parents[run_id] = parent_run_id
+        self._start(run_id, parent_run_id, kwargs.get("name", ""), metadata)
+
+    def on_retriever_end(
+        self,
+        documents: Sequence[Document],
+        *,
+        run_id: UUID,
+        **kwargs: Any,
+    ):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        seconds = time.perf_counter() - run.start
+        parent = self._runs.get(run.parent_run_id)
+        if parent is not None:
+            parent.child_seconds += seconds
+        if run.stage:
+            self._record(run.stage, seconds - run.child_seconds)
+        if run.name == "context_retriever":
+            self._record("retrieval", seconds)
+            for document in documents:
+                score = document.metadata.get("relevance_score")
+                if score is not None:
+                    self.registry.observe("ragbase_relevance_score", float(score))
+
+    def on_retriever_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        self._runs.pop(run_id, None)
+
+    def on_chain_start(
+        self,
+        serialized: Dict[str, Any],
+        inputs: Dict[str, Any],
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ):
+        self._parents[run_id] = parent_run_id
+        name = kwargs.get("name", "")
+        if name in ("format_documents", "ChatPromptTemplate"):
+            self._start(run_id, parent_run_id, name, metadata)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any):
+        run = self._runs.pop(run_id, None)
+        if run is None or run.stage:
+            return
+        stage = "context_packing" if run.name == "format_documents" else "prompt"
+        self._record(stage, time.perf_counter() - run.start)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        self._runs.pop(run_id, None)
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[list],
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ):
+        # Calls made inside a retriever stage, like the chain filter's, are
+        # timed as part of that stage and not as the answer. Models wrapped by
+        # the cache and the gateway are part of the outermost model's run.
+        self._parents[run_id] = parent_run_id
+        if self._enclosing_run(parent_run_id) or self._wraps_active_llm(parent_run_id):
+            return
+        self._start(run_id, parent_run_id, "llm", metadata)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any):
+        run = self._runs.get(run_id)
+        if run is None:
+            return
+        if run.first_token is None:
+            run.first_token = time.perf_counter()
+        run.tokens += 1
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        end = time.perf_counter()
+        self._record("llm", end - run.start)
+        if run.first_token is None:
+            return
+        time_to_first_token = run.first_token - run.start
+        self.timings["time_to_first_token"] = time_to_first_token
+        self.registry.observe(
+            "ragbase_llm_time_to_first_token_seconds", time_to_first_token
+        )
+        if run.tokens > 1 and end > run.first_token:
+            tokens_per_second = (run.tokens - 1) / (end - run.first_token)
+            self.timings["tokens_per_second"] = tokens_per_second
+            self.registry.observe("ragbase_llm_tokens_per_second", tokens_per_second)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        self._runs.pop(run_id, None)
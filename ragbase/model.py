@@ -1,31 +1,126 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List
+
 from langchain_community.chat_models import ChatOllama
 from langchain_community.document_compressors.flashrank_rerank import FlashrankRerank
-from langchain_community.embeddings.fastembed import FastEmbedEmbeddings
-from langchain_core.language_models import BaseLanguageModel
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel, BaseLanguageModel
 from langchain_groq import ChatGroq
 
 from ragbase.config import Config
+from ragbase.embeddings import (
+    CachedEmbeddings,
+    FastEmbedEngine,
+    get_embeddings_cache,
+)
+from ragbase.llm_gateway import GatewayChatModel, get_limiter
+
+
+def resident_memory() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+@dataclass
+class ModelStats:
+    name: str
+    load_seconds: float
+    memory_bytes: int
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._models: Dict[str, Any] = {}
+        self._stats: Dict[str, ModelStats] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, factory: Callable[[], Any]) -> Any:
+        if name in self._models:
+            return self._models[name]
+        with self._lock:
+            model_lock = self._locks.setdefault(name, threading.Lock())
+        with model_lock:
+            if name not in self._models:
+                memory_before = resident_memory()
+                start_time = time.perf_counter()
+                model = factory()
+                self._stats[name] = ModelStats(
+                    name=name,
+                    load_seconds=time.perf_counter() - start_time,
+                    memory_bytes=max(resident_memory() - memory_before, 0),
+                )
+                self._models[name] = model
+        return self._models[name]
+
+    def stats(self) -> List[ModelStats]:
+        return list(self._stats.values())
+
+
+registry = ModelRegistry()
+
+
+def create_local_llm() -> BaseChatModel:
+    return ChatOllama(
+        model=Config.Model.LOCAL_LLM,
+        temperature=Config.Model.TEMPERATURE,
+        keep_alive="1h",
+        max_tokens=Config.Model.MAX_TOKENS,
+    )
+
+
+def create_remote_llm(max_retries: int = 2) -> BaseChatModel:
+    return ChatGroq(
+        temperature=Config.Model.TEMPERATURE,
+        model_name=Config.Model.REMOTE_LLM,
+        max_tokens=Config.Model.MAX_TOKENS,
+        max_retries=max_retries,
+    )
 
 
 def create_llm() -> BaseLanguageModel:
+    if not Config.Gateway.ENABLED:
+        return create_local_llm() if Config.Model.USE_LOCAL else create_remote_llm()
+
+    # Retries are done by the gateway so throttling is seen by the limiter
     if Config.Model.USE_LOCAL:
-        return ChatOllama(
-            model=Config.Model.LOCAL_LLM,
-            temperature=Config.Model.TEMPERATURE,
-            keep_alive="1h",
-            max_tokens=Config.Model.MAX_TOKENS,
-        )
+        llm, fallback = create_local_llm(), None
     else:
-        return ChatGroq(
-            temperature=Config.Model.TEMPERATURE,
-            model_name=Config.Model.REMOTE_LLM,
-            max_tokens=Config.Model.MAX_TOKENS,
-        )
+        llm = create_remote_llm(max_retries=0)
+        fallback = create_local_llm() if Config.Gateway.FALLBACK_TO_LOCAL else None
+    return GatewayChatModel(
+        llm=llm, fallback=fallback, limiter=get_limiter(llm._llm_type)
+    )
 
 
-def create_embeddings() -> FastEmbedEmbeddings:
-    return FastEmbedEmbeddings(model_name=Config.Model.EMBEDDINGS)
+def create_embeddings() -> CachedEmbeddings:
+    embeddings = registry.get(
+        f"embeddings:{Config.Model.EMBEDDINGS}",
+        lambda: FastEmbedEngine(model_name=Config.Model.EMBEDDINGS),
+    )
+    return CachedEmbeddings(
+        embeddings,
+        model_name=Config.Model.EMBEDDINGS,
+        cache=get_embeddings_cache(),
+    )
 
 
 def create_reranker() -> FlashrankRerank:
-    return FlashrankRerank(model=Config.Model.RERANKER)
+    return registry.get(
+        f"reranker:{Config.Model.RERANKER}",
+        lambda: FlashrankRerank(model=Config.Model.RERANKER),
+    )
+
+
+def warmup() -> List[ModelStats]:
+    create_embeddings().embeddings.embed_query("warmup")
+    create_reranker().compress_documents(
+        [Document(page_content="warmup")], query="warmup"
+    )
+    return registry.stats()
@@ -0,0 +1,71 @@
+import asyncio
+import threading
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.runnables import Runnable
+
+from ragbase.chain import ask_question
+from ragbase.config import Config
+from ragbase.session_history import store
+
+
+@dataclass
+class PrecomputedAnswer:
+    question: str
+    answer: str
+    documents: List[Document] = field(default_factory=list)
+
+
+class AnswerPrecomputer:
+    def __init__(
+        self,
+        chain: Runnable,
+        questions: List[str],
+        concurrency: int = Config.Model.LLM_CONCURRENCY,
+    ):
+        self.chain = chain
+        self.questions = questions
+        self.concurrency = concurrency
+        self.answers: Dict[str, PrecomputedAnswer] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "AnswerPrecomputer":
+        self._thread = threading.Thread(
+            target=asyncio.run, args=(self.run(),), daemon=True
+        )
+        self._thread.start()
+        return self
+
+    async def run(self):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(
+            *[self._answer(question, semaphore) for question in self.questions],
+            return_exceptions=True,
+        )
+
+    async def _answer(self, question: str, semaphore: asyncio.Semaphore):
+        # Canned questions are answered without chat history
+        session_id = f"precompute-{uuid.uuid4()}"
+        answer, documents = [], []
+        async with semaphore:
+            try:
+                async for event in ask_question(self.chain, question, session_id):
+                    if type(event) is str:
+                        answer.append(event)
+                    if type(event) is list:
+                        documents.extend(event)
+            finally:
+                store.delete(session_id)
+        self.answers[question] = PrecomputedAnswer(
+            question=question, answer="".join(answer), documents=documents
+        )
+
+    def get(self, question: str) -> Optional[PrecomputedAnswer]:
+        return self.answers.get(question)
+
+    def wait(self, timeout: Optional[float] = None):
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,31 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple
+
+
+@dataclass
+class IngestionEvent:
+    stage: str
+    source: str
+    items: int
+    seconds: float
+    completed: int = 0
+    total: int = 0
+    # Share of the pages of the current document already chunked
+    document_fraction: float = 0.0
+
+    @property
+    def fraction(self) -> float:
+        if not self.total:
+            return 1.0
+        return min((self.completed + self.document_fraction) / self.total, 1.0)
+
+
+ProgressCallback = Callable[[IngestionEvent], None]
+
+
+def summarize(events: List[IngestionEvent]) -> Dict[str, Tuple[int, float]]:
+    summary = {}
+    for event in events:
+        items, seconds = summary.get(event.stage, (0, 0.0))
+        summary[event.stage] = (items + event.items, seconds + event.seconds)
+    return summary
@@ -0,0 +1,170 @@
+import asyncio
+import re
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Optional, Sequence
+
+from langchain_core.callbacks import Callbacks
+from langchain_core.documents import BaseDocumentCompressor, Document
+from langchain_core.language_models import BaseLanguageModel
+
+from ragbase.config import Config
+
+DOCUMENT_PROMPT = """
+Given the question and the context below, answer YES if the context is relevant
+to the question and NO if it isn't. Answer with a single word.
+
+Question: {question}
+
+Context:
+{context}
+
+Relevant (YES / NO):
+"""
+
+BATCH_PROMPT = """
+Given the question and the numbered contexts below, list the numbers of the
+contexts that are relevant to the question, separated by commas.
+Answer NONE if no context is relevant. Answer only with the numbers or NONE.
+
+Question: {question}
+
+{contexts}
+
+Relevant contexts:
+"""
+
+
+def parse_relevance(text: str) -> Optional[bool]:
+    words = text.strip().split()
+    answer = words[0].strip(".,!:").upper() if words else ""
+    if answer in ("YES", "NO"):
+        return answer == "YES"
+    return None
+
+
+def parse_relevant_numbers(text: str, count: int) -> Optional[List[int]]:
+    if text.strip().upper().startswith("NONE"):
+        return []
+    numbers = [int(number) for number in re.findall(r"\d+", text)]
+    if not numbers:
+        return None
+    return sorted({number for number in numbers if 1 <= number <= count})
+
+
+class RelevanceFilter(BaseDocumentCompressor):
+    """Drops documents the LLM judges irrelevant to the question.
+
+    Documents are either scored with concurrent calls, one per document, or
+    all at once with a single batched prompt. The timeout bounds the whole
+    filter. A document is kept when its call hasn't finished by then, fails
+    or returns an answer that can't be parsed.
+    """
+
+    llm: BaseLanguageModel
+    batched: bool = Config.Retriever.CHAIN_FILTER_BATCHED
+    concurrency: int = Config.Retriever.CHAIN_FILTER_CONCURRENCY
+    timeout: float = Config.Retriever.CHAIN_FILTER_TIMEOUT
+
+    def _text(self, output) -> str:
+        return output if isinstance(output, str) else output.content
+
+    def _batch_prompt(self, documents: Sequence[Document], query: str) -> str:
+        contexts = "\n\n".join(
+            f"Context {number}:\n{document.page_content}"
+            for number, document in enumerate(documents, 1)
+        )
+        return BATCH_PROMPT.format(question=query, contexts=contexts)
+
+    def _select(
+        self, documents: Sequence[Document], text: Optional[str]
+    ) -> List[Document]:
+        numbers = None if text is None else parse_relevant_numbers(text, len(documents))
+        if numbers is None:
+            return list(documents)
+        return [documents[number - 1] for number in numbers]
+
+    def compress_documents(
+        self,
+        documents: Sequence[Document],
+        query: str,
+        callbacks: Optional[Callbacks] = None,
+    ) -> Sequence[Document]:
+        if not documents:
+            return []
+        config = {"callbacks": callbacks}
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        try:
+            if self.batched:
+                prompt = self._batch_prompt(documents, query)
+                future = executor.submit(self.llm.invoke, prompt, config)
+                try:
+                    text = self._text(future.result(timeout=self.timeout))
+                except Exception:
+                    text = None
+                return self._select(documents, text)
+
+            futures = [
+                executor.submit(
+                    self.llm.invoke,
+                    DOCUMENT_PROMPT.format(
+                        question=query, context=document.page_content
+                    ),
+                    config,
+                )
+                for document in documents
+            ]
+            wait(futures, timeout=self.timeout)
+            kept = []
+            for document, future in zip(documents, futures):
+                try:
+                    relevant = parse_relevance(self._text(future.result(timeout=0)))
+                except Exception:
+                    relevant = None
+                if relevant is not False:
+                    kept.append(document)
+            return kept
+        finally:
+            # Calls still queued are cancelled, running ones finish in the
+            # background
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def acompress_documents(
+        self,
+        documents: Sequence[Document],
+        query: str,
+        callbacks: Optional[Callbacks] = None,
+    ) -> Sequence[Document]:
+        if not documents:
+            return []
+        config = {"callbacks": callbacks}
+
+        if self.batched:
+            prompt = self._batch_prompt(documents, query)
+            try:
+                output = await asyncio.wait_for(
+                    self.llm.ainvoke(prompt, config), self.timeout
+                )
+                text = self._text(output)
+            except Exception:
+                text = None
+            return self._select(documents, text)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def is_relevant(document: Document) -> Optional[bool]:
+            prompt = DOCUMENT_PROMPT.format(
+                question=query, context=document.page_content
+            )
+            async with semaphore:
+                output = await self.llm.ainvoke(prompt, config)
+            return parse_relevance(self._text(output))
+
+        tasks = [asyncio.ensure_future(is_relevant(document)) for document in documents]
+        done, pending = await asyncio.wait(tasks, timeout=self.timeout)
+        for task in pending:
+            task.cancel()
+        return [
+            document
+            for document, task in zip(documents, tasks)
+            if task not in done or task.exception() or task.result() is not False
+        ]
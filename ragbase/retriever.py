@@ -1,37 +1,257 @@
-from typing import Optional
+from pathlib import Path
+from typing import List, Optional, Tuple
 
+from flashrank import RerankRequest
 from langchain.retrievers import ContextualCompressionRetriever
-from langchain.retrievers.document_compressors.chain_filter import LLMChainFilter
+from langchain_community.document_compressors.flashrank_rerank import FlashrankRerank
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
 from langchain_core.language_models import BaseLanguageModel
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables.config import run_in_executor
 from langchain_core.vectorstores import VectorStore, VectorStoreRetriever
-from langchain_qdrant import Qdrant
 
+from ragbase.cache import TTLCache
 from ragbase.config import Config
+from ragbase.database import collection_version, create_vector_store, source_filter
+from ragbase.embeddings import normalize_text
+from ragbase.keyword_index import KeywordIndex, get_keyword_index
+from ragbase.metrics import metrics
 from ragbase.model import create_embeddings, create_reranker
+from ragbase.relevance_filter import RelevanceFilter
+
+
+class CachedRetriever(BaseRetriever):
+    retriever: BaseRetriever
+    cache: TTLCache
+    database_dir: Optional[Path] = None
+
+    def _key(self, query: str) -> tuple:
+        return collection_version(self.database_dir), normalize_text(query).lower()
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        key = self._key(query)
+        documents = self.cache.get(key)
+        if documents is None:
+            documents = self.retriever.invoke(
+                query, config={"callbacks": run_manager.get_child()}
+            )
+            self.cache.set(key, documents)
+        return list(documents)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        key = self._key(query)
+        documents = self.cache.get(key)
+        if documents is None:
+            documents = await self.retriever.ainvoke(
+                query, config={"callbacks": run_manager.get_child()}
+            )
+            self.cache.set(key, documents)
+        return list(documents)
+
+
+def is_keyword_query(query: str, max_words: int) -> bool:
+    query = query.strip()
+    if len(query) > 1 and query[0] == query[-1] == '"':
+        return True
+    return len(query.split()) <= max_words and not query.endswith("?")
+
+
+def _document_key(document: Document) -> tuple:
+    metadata = document.metadata
+    if "_id" in metadata:
+        return (str(metadata["_id"]),)
+    return metadata.get("source_hash"), metadata.get("start_index")
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[Document]], k: int, rrf_k: int
+) -> List[Document]:
+    scores, documents = {}, {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, 1):
+            key = _document_key(document)
+            scores[key] = scores.get(key, 0.0) + 1 / (rrf_k + rank)
+            documents.setdefault(key, document)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [documents[key] for key in ranked[:k]]
+
+
+class HybridRetriever(BaseRetriever):
+    """Fuses dense results with BM25 keyword results.
+
+    Short keyword lookups that match the index are answered from it alone,
+    without embedding the query.
+    """
+
+    retriever: BaseRetriever
+    keyword_index: KeywordIndex
+    k: int
+    source_hashes: Optional[List[str]] = None
+    rrf_k: int = Config.Retriever.RRF_K
+    keyword_max_words: int = Config.Retriever.KEYWORD_MAX_WORDS
+
+    def _keyword_search(self, query: str) -> List[Document]:
+        results = self.keyword_index.search(query, self.k, self.source_hashes)
+        return [document for document, _ in results]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        keyword_documents = self._keyword_search(query)
+        if keyword_documents and is_keyword_query(query, self.keyword_max_words):
+            metrics.inc("ragbase_keyword_only_queries")
+            return keyword_documents
+        dense_documents = self.retriever.invoke(
+            query, config={"callbacks": run_manager.get_child()}
+        )
+        return reciprocal_rank_fusion(
+            [dense_documents, keyword_documents], self.k, self.rrf_k
+        )
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        keyword_documents = await run_in_executor(None, self._keyword_search, query)
+        if keyword_documents and is_keyword_query(query, self.keyword_max_words):
+            metrics.inc("ragbase_keyword_only_queries")
+            return keyword_documents
+        dense_documents = await self.retriever.ainvoke(
+            query, config={"callbacks": run_manager.get_child()}
+        )
+        return reciprocal_rank_fusion(
+            [dense_documents, keyword_documents], self.k, self.rrf_k
+        )
+
+
+class RerankRetriever(BaseRetriever):
+    """Reranks an over-fetched candidate pool and returns the top documents.
+
+    Candidates are reranked in similarity order, a step at a time, until the
+    mean score of the top documents stops improving by more than the plateau.
+    """
+
+    retriever: BaseRetriever
+    reranker: FlashrankRerank
+    top_n: int = Config.Retriever.RERANK_TOP_N
+    step: int = Config.Retriever.RERANK_STEP
+    plateau: float = Config.Retriever.RERANK_PLATEAU
+
+    def _score(self, query: str, documents: List[Document]) -> List[float]:
+        passages = [
+            {"id": position, "text": document.page_content}
+            for position, document in enumerate(documents)
+        ]
+        results = self.reranker.client.rerank(
+            RerankRequest(query=query, passages=passages)
+        )
+        scores = [0.0] * len(documents)
+        for result in results:
+            scores[result["id"]] = float(result["score"])
+        return scores
+
+    def _rerank(self, query: str, candidates: List[Document]) -> List[Document]:
+        scored: List[Tuple[float, Document]] = []
+        best = 0.0
+        step = max(self.step, self.top_n)
+        for start in range(0, len(candidates), step):
+            batch = candidates[start : start + step]
+            scored.extend(zip(self._score(query, batch), batch))
+            scored.sort(key=lambda item: item[0], reverse=True)
+            top_scores = [score for score, _ in scored[: self.top_n]]
+            mean = sum(top_scores) / len(top_scores)
+            if start and mean - best < self.plateau:
+                break
+            best = mean
+
+        metrics.observe("ragbase_rerank_candidates", len(scored))
+        documents = []
+        for score, document in scored[: self.top_n]:
+            document = document.copy(deep=True)
+            document.metadata["relevance_score"] = score
+            documents.append(document)
+        return documents
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        candidates = self.retriever.invoke(
+            query, config={"callbacks": run_manager.get_child()}
+        )
+        return self._rerank(query, candidates)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        candidates = await self.retriever.ainvoke(
+            query, config={"callbacks": run_manager.get_child()}
+        )
+        return await run_in_executor(None, self._rerank, query, candidates)
 
 
 def create_retriever(
-    llm: BaseLanguageModel, vector_store: Optional[VectorStore] = None
+    llm: BaseLanguageModel,
+    vector_store: Optional[VectorStore] = None,
+    source_hashes: Optional[List[str]] = None,
+    database_dir: Optional[Path] = None,
 ) -> VectorStoreRetriever:
     if not vector_store:
-        vector_store = Qdrant.from_existing_collection(
-            embedding=create_embeddings(),
-            collection_name=Config.Database.DOCUMENTS_COLLECTION,
-            path=Config.Path.DATABASE_DIR,
-        )
+        vector_store = create_vector_store(create_embeddings(), database_dir)
+
+    # With the reranker a larger candidate pool is fetched and cut down to top n
+    search_kwargs = {
+        "k": Config.Retriever.RERANK_POOL_SIZE
+        if Config.Retriever.USE_RERANKER
+        else Config.Retriever.SEARCH_K
+    }
+    if source_hashes:
+        search_kwargs["filter"] = source_filter(source_hashes)
 
+    # The stage metadata is used by StageTimingHandler to time each layer
     retriever = vector_store.as_retriever(
-        search_type="similarity", search_kwargs={"k": 5}
+        search_type="similarity",
+        search_kwargs=search_kwargs,
+        metadata={"stage": "vector_search"},
     )
 
+    if Config.Retriever.USE_HYBRID:
+        retriever = HybridRetriever(
+            retriever=retriever,
+            keyword_index=get_keyword_index(database_dir),
+            k=search_kwargs["k"],
+            source_hashes=source_hashes,
+            metadata={"stage": "keyword_search"},
+        )
+
     if Config.Retriever.USE_RERANKER:
-        retriever = ContextualCompressionRetriever(
-            base_compressor=create_reranker(), base_retriever=retriever
+        retriever = RerankRetriever(
+            retriever=retriever,
+            reranker=create_reranker(),
+            metadata={"stage": "rerank"},
         )
 
     if Config.Retriever.USE_CHAIN_FILTER:
         retriever = ContextualCompressionRetriever(
-            base_compressor=LLMChainFilter.from_llm(llm), base_retriever=retriever
+            base_compressor=RelevanceFilter(llm=llm),
+            base_retriever=retriever,
+            metadata={"stage": "chain_filter"},
+        )
+
+    if Config.Retriever.USE_CACHE:
+        retriever = CachedRetriever(
+            retriever=retriever,
+            cache=TTLCache(
+                max_entries=Config.Retriever.CACHE_MAX_ENTRIES,
+                ttl=Config.Retriever.CACHE_TTL,
+            ),
+            database_dir=database_dir,
         )
 
     return retriever
@@ -0,0 +1,204 @@
+import argparse
+import asyncio
+import io
+import json
+import shutil
+import uuid
+from functools import partial
+from pathlib import Path
+from typing import Dict, List
+
+from langchain_core.documents import Document
+from tornado.httputil import HTTPFile
+from tornado.iostream import StreamClosedError
+from tornado.web import Application, HTTPError, RequestHandler
+
+from ragbase.chain import ask_question
+from ragbase.chain_cache import (
+    QAChainCache,
+    create_qa_chain,
+    document_set_dir,
+    document_set_key,
+)
+from ragbase.config import Config
+from ragbase.database import manifest_file
+from ragbase.manifest import IngestionManifest, stream_digest
+from ragbase.metrics import metrics
+from ragbase.model import warmup
+
+
+def document_to_json(document: Document) -> dict:
+    return {"content": document.page_content, "metadata": document.metadata}
+
+
+def _json_default(value):
+    # Reranker scores are numpy scalars
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class ServerState:
+    def __init__(self):
+        self.chains = QAChainCache()
+        self.document_sets: Dict[str, List[str]] = {}
+
+    async def get_chain(self, source_hashes: List[str], doc_paths: List[Path]):
+        build = partial(create_qa_chain, source_hashes, doc_paths)
+        # Building a chain ingests and loads models, keep it off the event loop
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.chains.get_or_build, source_hashes, build
+        )
+
+
+class BaseHandler(RequestHandler):
+    def initialize(self, state: ServerState):
+        self.state = state
+
+    def write_error(self, status_code: int, **kwargs):
+        self.finish({"error": self._reason})
+
+
+class HealthHandler(BaseHandler):
+    def get(self):
+        self.write({"status": "ok", "chains": len(self.state.chains)})
+
+
+class MetricsHandler(BaseHandler):
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.write(metrics.render())
+
+
+def _digest_uploads(files: List[HTTPFile]) -> Dict[str, HTTPFile]:
+    return {stream_digest(io.BytesIO(file.body)): file for file in files}
+
+
+def _write_uploads(
+    contents: Dict[str, HTTPFile], key: str, upload_dir: Path
+) -> List[Path]:
+    manifest = IngestionManifest(manifest_file(document_set_dir(key)))
+    doc_paths = []
+    for source_hash, file in contents.items():
+        if source_hash in manifest:
+            continue
+        doc_path = upload_dir / source_hash / Path(file.filename).name
+        doc_path.parent.mkdir(parents=True, exist_ok=True)
+        doc_path.write_bytes(file.body)
+        doc_paths.append(doc_path)
+    return doc_paths
+
+
+class IngestHandler(BaseHandler):
+    async def post(self):
+        files = self.request.files.get("files", [])
+        if not files:
+            raise HTTPError(400, reason="No files uploaded")
+
+        for file in files:
+            if not file.filename.lower().endswith(".pdf"):
+                raise HTTPError(400, reason=f"Not a PDF file: {file.filename}")
+
+        # Uploads can be large, hashing and writing them would block the loop
+        loop = asyncio.get_running_loop()
+        contents = await loop.run_in_executor(None, _digest_uploads, files)
+        source_hashes = sorted(contents)
+        key = document_set_key(source_hashes)
+        upload_dir = Config.Path.DOCUMENTS_DIR / key
+        doc_paths = await loop.run_in_executor(
+            None, _write_uploads, contents, key, upload_dir
+        )
+
+        try:
+            await self.state.get_chain(source_hashes, doc_paths)
+        finally:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+
+        self.state.document_sets[key] = source_hashes
+        self.write(
+            {
+                "document_set": key,
+                "documents": [
+                    {"name": file.filename, "source_hash": source_hash}
+                    for source_hash, file in contents.items()
+                ],
+            }
+        )
+
+
+class AskHandler(BaseHandler):
+    async def post(self):
+        try:
+            body = json.loads(self.request.body)
+            key, question = body["document_set"], body["question"].strip()
+        except (ValueError, KeyError, AttributeError):
+            raise HTTPError(400, reason="Expected document_set and question")
+        if not question:
+            raise HTTPError(400, reason="Empty question")
+        source_hashes = self.state.document_sets.get(key)
+        if source_hashes is None:
+            raise HTTPError(404, reason=f"Unknown document set: {key}")
+        # Evicted sets are deleted and have to be ingested again
+        chain = self.state.chains.get(source_hashes)
+        if chain is None:
+            self.state.document_sets.pop(key, None)
+            raise HTTPError(404, reason=f"Evicted document set: {key}")
+        session_id = body.get("session_id") or str(uuid.uuid4())
+
+        self.set_header("Content-Type", "text/event-stream")
+        self.set_header("Cache-Control", "no-cache")
+        self.set_header("X-Accel-Buffering", "no")
+        try:
+            async for event in ask_question(chain, question, session_id):
+                if isinstance(event, str):
+                    await self.send_event("token", event)
+                else:
+                    await self.send_event(
+                        "sources", [document_to_json(doc) for doc in event]
+                    )
+            await self.send_event("done", {"session_id": session_id})
+        except StreamClosedError:
+            return
+
+    async def send_event(self, event: str, data):
+        self.write(
+            f"event: {event}\ndata: {json.dumps(data, default=_json_default)}\n\n"
+        )
+        await self.flush()
+
+
+def create_app(state: ServerState = None) -> Application:
+    state = state or ServerState()
+    handler_args = {"state": state}
+    return Application(
+        [
+            (r"/health", HealthHandler, handler_args),
+            (r"/metrics", MetricsHandler, handler_args),
+            (r"/ingest", IngestHandler, handler_args),
+            (r"/ask", AskHandler, handler_args),
+        ]
+    )
+
+
+async def serve(host: str, port: int):
+    if Config.Model.WARMUP:
+        await asyncio.get_running_loop().run_in_executor(None, warmup)
+    create_app().listen(
+        port,
+        address=host,
+        max_body_size=Config.Server.MAX_UPLOAD_BYTES,
+        max_buffer_size=Config.Server.MAX_UPLOAD_BYTES,
+    )
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the QA chain over HTTP")
+    parser.add_argument("--host", default=Config.Server.HOST)
+    parser.add_argument("--port", type=int, default=Config.Server.PORT)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
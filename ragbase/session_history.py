@@ -1,9 +1,317 @@
-from langchain_community.chat_message_histories import ChatMessageHistory
+import atexit
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple
 
-store = {}
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.messages import (
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    messages_from_dict,
+    messages_to_dict,
+)
 
+from ragbase.config import Config
+from ragbase.context import estimate_tokens
 
-def get_session_history(session_id: str) -> ChatMessageHistory:
-    if session_id not in store:
-        store[session_id] = ChatMessageHistory()
-    return store[session_id]
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """
+Progressively summarize the conversation between a user and a legal assistant.
+Keep facts, figures, clauses and open questions. Return only the new summary.
+
+Current summary:
+{summary}
+
+New lines of conversation:
+{lines}
+"""
+
+
+class CompactingChatMessageHistory(BaseChatMessageHistory):
+    def __init__(
+        self,
+        max_turns: int = Config.History.MAX_TURNS,
+        max_tokens: int = Config.History.MAX_TOKENS,
+    ):
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.all_messages: List[BaseMessage] = []
+        self.summary = ""
+        self.summarized_count = 0
+        self.summarizer: Optional[BaseLanguageModel] = None
+        self.on_change: Optional[Callable[[], None]] = None
+        self._lock = threading.Lock()
+        self._summarizing = False
+        self._summary_failures = 0
+        self._summary_retry_at = 0.0
+
+    def _window_start(self) -> int:
+        start = len(self.all_messages)
+        tokens = 0
+        while start > 0 and len(self.all_messages) - start < 2 * self.max_turns:
+            tokens += estimate_tokens(str(self.all_messages[start - 1].content))
+            if tokens > self.max_tokens:
+                break
+            start -= 1
+        return start
+
+    def _prompt_start(self) -> int:
+        # Turns that are not folded into the summary yet, because it is off,
+        # behind or failing, stay verbatim while they fit in the token budget
+        start = self._window_start()
+        tokens = sum(
+            estimate_tokens(str(message.content))
+            for message in self.all_messages[start:]
+        )
+        while start > self.summarized_count:
+            tokens += estimate_tokens(str(self.all_messages[start - 1].content))
+            if tokens > self.max_tokens:
+                break
+            start -= 1
+        return start
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        with self._lock:
+            messages = self.all_messages[self._prompt_start() :]
+            if self.summary:
+                summary = f"Summary of the earlier conversation:\n{self.summary}"
+                messages = [SystemMessage(content=summary)] + messages
+            return messages
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change()
+
+    def add_messages(self, messages: Sequence[BaseMessage]):
+        with self._lock:
+            self.all_messages.extend(messages)
+        self._changed()
+        with self._lock:
+            if (
+                self.summarizer is None
+                or self._summarizing
+                or time.monotonic() < self._summary_retry_at
+                or self._window_start() <= self.summarized_count
+            ):
+                return
+            self._summarizing = True
+        threading.Thread(target=self._summarize, daemon=True).start()
+
+    def _summarize(self):
+        try:
+            while True:
+                with self._lock:
+                    end = self._window_start()
+                    if end <= self.summarized_count:
+                        return
+                    messages = self.all_messages[self.summarized_count : end]
+                    summary = self.summary
+                lines = "\n".join(
+                    f"{message.type}: {message.content}" for message in messages
+                )
+                prompt = SUMMARY_PROMPT.format(summary=summary or "-", lines=lines)
+                try:
+                    response = self.summarizer.invoke([HumanMessage(content=prompt)])
+                except Exception:
+                    with self._lock:
+                        self._summary_failures += 1
+                        backoff = min(
+                            Config.History.SUMMARY_BACKOFF
+                            * 2 ** (self._summary_failures - 1),
+                            Config.History.SUMMARY_MAX_BACKOFF,
+                        )
+                        self._summary_retry_at = time.monotonic() + backoff
+                    logger.warning(
+                        "Summarizing the chat history failed, retrying in %.0fs",
+                        backoff,
+                        exc_info=True,
+                    )
+                    return
+                with self._lock:
+                    self.summary = str(response.content).strip()
+                    self.summarized_count = end
+                    self._summary_failures = 0
+                self._changed()
+        finally:
+            with self._lock:
+                self._summarizing = False
+
+    def clear(self):
+        with self._lock:
+            self.all_messages = []
+            self.summary = ""
+            self.summarized_count = 0
+        self._changed()
+
+    def to_json(self) -> str:
+        with self._lock:
+            return json.dumps(
+                {
+                    "messages": messages_to_dict(self.all_messages),
+                    "summary": self.summary,
+                    "summarized_count": self.summarized_count,
+                }
+            )
+
+    @classmethod
+    def from_json(cls, data: str) -> "CompactingChatMessageHistory":
+        state = json.loads(data)
+        history = cls()
+        history.all_messages = messages_from_dict(state["messages"])
+        history.summary = state["summary"]
+        history.summarized_count = state["summarized_count"]
+        return history
+
+
+class SessionStore:
+    def __init__(
+        self,
+        max_sessions: int = Config.Session.MAX_SESSIONS,
+        ttl: float = Config.Session.TTL,
+    ):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: OrderedDict[str, Tuple[float, CompactingChatMessageHistory]] = (
+            OrderedDict()
+        )
+        self._lock = threading.RLock()
+
+    def get(self, session_id: str) -> CompactingChatMessageHistory:
+        with self._lock:
+            if session_id in self._sessions:
+                history = self._sessions[session_id][1]
+                self._sessions.move_to_end(session_id)
+            else:
+                history = self._load(session_id) or CompactingChatMessageHistory()
+                history.on_change = lambda: self._changed(session_id, history)
+            self._sessions[session_id] = (time.monotonic(), history)
+            self._evict()
+            return history
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _evict(self):
+        expires = time.monotonic() - self.ttl
+        while self._sessions:
+            session_id, (last_access, history) = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and last_access >= expires:
+                break
+            self._sessions.popitem(last=False)
+            self._evicted(session_id, history)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _load(self, session_id: str) -> Optional[CompactingChatMessageHistory]:
+        return None
+
+    def _changed(self, session_id: str, history: CompactingChatMessageHistory):
+        pass
+
+    def _evicted(self, session_id: str, history: CompactingChatMessageHistory):
+        pass
+
+
+class SqliteSessionStore(SessionStore):
+    def __init__(
+        self,
+        path: Path = Config.Path.SESSIONS_FILE,
+        flush_interval: float = Config.Session.FLUSH_INTERVAL,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+        self._dirty = {}
+        self._connection = sqlite3.connect(
+            str(path), timeout=30, check_same_thread=False
+        )
+        with self._connection:
+            # WAL with synchronous=NORMAL avoids an fsync per committed batch
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions "
+                "(id TEXT PRIMARY KEY, history TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def _load(self, session_id: str) -> Optional[CompactingChatMessageHistory]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT history, updated FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        if row is None or row[1] < time.time() - self.ttl:
+            return None
+        return CompactingChatMessageHistory.from_json(row[0])
+
+    def _changed(self, session_id: str, history: CompactingChatMessageHistory):
+        with self._lock:
+            self._dirty[session_id] = history
+
+    def _evicted(self, session_id: str, history: CompactingChatMessageHistory):
+        self.flush()
+
+    def delete(self, session_id: str):
+        with self._lock:
+            super().delete(session_id)
+            self._dirty.pop(session_id, None)
+            with self._connection:
+                self._connection.execute(
+                    "DELETE FROM sessions WHERE id = ?", (session_id,)
+                )
+
+    def flush(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            if not dirty:
+                return
+            now = time.time()
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO sessions (id, history, updated) "
+                    "VALUES (?, ?, ?)",
+                    [
+                        (session_id, history.to_json(), now)
+                        for session_id, history in dirty.items()
+                    ],
+                )
+                self._connection.execute(
+                    "DELETE FROM sessions WHERE updated < ?", (now - self.ttl,)
+                )
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+
+def create_session_store() -> SessionStore:
+    if Config.Session.PERSIST:
+        return SqliteSessionStore()
+    return SessionStore()
+
+
+store = create_session_store()
+
+
+def get_session_history(
+    session_id: str, summarizer: Optional[BaseLanguageModel] = None
+) -> CompactingChatMessageHistory:
+    history = store.get(session_id)
+    if summarizer is not None:
+        history.summarizer = summarizer
+    return history
@@ -0,0 +1,54 @@
+import time
+from typing import Callable, List, Optional
+
+from ragbase.config import Config
+
+
+class BufferedRenderer:
+    def __init__(
+        self,
+        render: Callable[[str], None],
+        flush_interval: Optional[float] = None,
+        flush_characters: Optional[int] = None,
+    ):
+        self.render = render
+        self.flush_interval = (
+            Config.Streaming.FLUSH_INTERVAL
+            if flush_interval is None
+            else flush_interval
+        )
+        self.flush_characters = (
+            Config.Streaming.FLUSH_CHARACTERS
+            if flush_characters is None
+            else flush_characters
+        )
+        self._parts: List[str] = []
+        self._pending = 0
+        self._last_flush = 0.0
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def write(self, token: str):
+        self._parts.append(token)
+        self._pending += len(token)
+        if (
+            self._pending >= self.flush_characters
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            text = self.text
+            self._parts = [text]
+            self.render(text)
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def __enter__(self) -> "BufferedRenderer":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
@@ -0,0 +1,81 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Optional, Protocol
+
+from deep_translator import GoogleTranslator
+
+from ragbase.cache import SqliteCache
+from ragbase.config import Config
+
+
+class TranslationBackend(Protocol):
+    def translate_batch(
+        self, texts: List[str], source: str, target: str
+    ) -> List[str]: ...
+
+
+class GoogleTranslationBackend:
+    def __init__(self, max_workers: int = 8):
+        self.max_workers = max_workers
+
+    def translate_batch(self, texts: List[str], source: str, target: str) -> List[str]:
+        # GoogleTranslator mutates its request params, so use one per text
+        def translate(text: str) -> str:
+            return GoogleTranslator(source=source, target=target).translate(text)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(translate, texts))
+
+
+class Translator:
+    def __init__(
+        self,
+        backend: Optional[TranslationBackend] = None,
+        cache: Optional[SqliteCache] = None,
+    ):
+        self.backend = backend or GoogleTranslationBackend()
+        self.cache = cache or SqliteCache(
+            Config.Path.CACHE_DIR / "translations.sqlite",
+            max_entries=Config.Cache.TRANSLATIONS_MAX_ENTRIES,
+        )
+
+    @staticmethod
+    def _key(text: str, source: str, target: str) -> str:
+        return hashlib.sha256(f"{source}:{target}:{text}".encode("utf-8")).hexdigest()
+
+    def translate_many(
+        self, texts: List[str], target: str, source: str = "en"
+    ) -> List[str]:
+        if target == source:
+            return list(texts)
+
+        keys = [self._key(text, source, target) for text in texts]
+        translations = {
+            key: value.decode("utf-8")
+            for key, value in self.cache.get_many(keys).items()
+        }
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in translations and text.strip():
+                missing[key] = text
+        if missing:
+            translated = self.backend.translate_batch(
+                list(missing.values()), source, target
+            )
+            translated = dict(zip(missing.keys(), translated))
+            self.cache.set_many(
+                {key: value.encode("utf-8") for key, value in translated.items()}
+            )
+            translations.update(translated)
+
+        return [translations.get(key, text) for key, text in zip(keys, texts)]
+
+    def translate(self, text: str, target: str, source: str = "en") -> str:
+        return self.translate_many([text], target, source)[0]
+
+
+@lru_cache(maxsize=None)
+def get_translator() -> Translator:
+    return Translator()
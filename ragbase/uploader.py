@@ -8,16 +8,18 @@ from ragbase.config import Config
 
 
 def upload_files(
-    files: List[UploadedFile], remove_old_files: bool = True
+    files: List[UploadedFile],
+    remove_old_files: bool = True,
+    directory: Path = Config.Path.DOCUMENTS_DIR,
 ) -> List[Path]:
     if remove_old_files:
-        shutil.rmtree(Config.Path.DATABASE_DIR, ignore_errors=True)
-        shutil.rmtree(Config.Path.DOCUMENTS_DIR, ignore_errors=True)
-    Config.Path.DOCUMENTS_DIR.mkdir(parents=True, exist_ok=True)
+        shutil.rmtree(directory, ignore_errors=True)
+    directory.mkdir(parents=True, exist_ok=True)
     file_paths = []
     for file in files:
-        file_path = Config.Path.DOCUMENTS_DIR / file.name
+        file_path = directory / file.name
+        file.seek(0)
         with file_path.open("wb") as f:
-            f.write(file.getvalue())
+            shutil.copyfileobj(file, f, Config.Ingestion.UPLOAD_CHUNK_SIZE)
         file_paths.append(file_path)
     return file_paths